@@ -3,13 +3,20 @@ from importlib.metadata import version
 __version__ = version("napari-debcr")
 
 from ._reader import get_reader
-from ._writer import npz_file_writer
+from ._writer import npz_file_writer, zarr_file_writer
 #from ._sample_data import make_sample_data
-from ._plugin import DeBCRPlugin
 
 __all__ = (
     "get_reader",
     "npz_file_writer",
+    "zarr_file_writer",
 #    "make_sample_data",
     "DeBCRPlugin"
 )
+
+def __getattr__(name):
+    # widgets need Qt: imported on first use, so headless runs (e.g. the batch CLI) work without it
+    if name == "DeBCRPlugin":
+        from ._plugin import DeBCRPlugin
+        return DeBCRPlugin
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
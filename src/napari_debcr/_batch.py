@@ -0,0 +1,91 @@
+import os
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from typing import Dict, Iterator, Optional, Tuple
+
+from ._lazy import check_complete, iter_row_blocks
+from ._transforms import run_transform
+
+def run_batch(action: str, inputs: Dict[str, object], params: Dict[str, dict], workers: Optional[int] = None) -> Iterator[Tuple[str, object, dict]]:
+    """Run a data transform on many arrays in a process pool.
+
+    Inputs are copied block by block into shared memory, so lazy arrays
+    are never pickled; at most `workers` inputs are held at a time.
+    Yields (name, output, metadata) in order of completion; `params` holds
+    the transform settings per input name.
+    """
+
+    workers = max(1, min(workers or os.cpu_count(), len(inputs)))
+    pending = {}
+    queue = iter(inputs.items())
+
+    # spawn: workers do not inherit Qt or TensorFlow state of the viewer;
+    # this module and its imports load neither (TensorFlow only for debcr transforms)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        try:
+            while True:
+                while len(pending) < workers:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    name, data = item
+                    shm = _to_shared(data)
+                    future = pool.submit(_run_shared, action, shm.name, tuple(data.shape), np.dtype(data.dtype).str, params[name])
+                    pending[future] = (name, shm)
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, shm = pending.pop(future)
+                    _release(shm)
+                    output, metadata = future.result()
+                    yield name, output, metadata
+        finally:
+            for future, (_, shm) in pending.items():
+                future.cancel()
+                _release(shm)
+
+def _to_shared(data) -> SharedMemory:
+
+    error = check_complete(data)
+    if error is not None:
+        raise ValueError(error)
+
+    shape, dtype = tuple(data.shape), np.dtype(data.dtype)
+    shm = SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    if array.ndim == 0:
+        array[()] = np.asarray(data)
+    for start, stop in iter_row_blocks(data):
+        array[start:stop] = data[start:stop]
+
+    del array # release the buffer export before close
+    return shm
+
+def _release(shm):
+    shm.close()
+    shm.unlink()
+
+def _run_shared(action, shm_name, shape, dtype, params):
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        data = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        # outputs are sent back whole: no views of, or files next to, the input
+        params = dict(params, use_views=False, use_scratch=False)
+        output, metadata = run_transform(action, data, params)
+        output = np.array(output) # detach from the shared input
+        del data
+        return output, metadata
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            pass # still exported by a traceback, closed on exit
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from typing import Optional, Tuple
+
+from ._lazy import iter_row_blocks
+from ._scratch import _remove
+from ._transforms import TRANSFORM_ARGS
+
+# flags, which change the kind of transform output
+OUTPUT_FLAGS = ['use_streaming', 'use_views', 'use_scratch']
+
+# in-memory inputs up to this size are hashed in full
+FULL_HASH_NBYTES = 64 * 1024**2
+# rows hashed of larger or lazy inputs
+SAMPLE_ROWS = 8
+
+def fingerprint(data) -> str:
+    """Hash of an array (or lazy array) with its shape and dtype.
+
+    Small in-memory arrays are hashed in full, so an edit anywhere gives a
+    new key. Larger or lazy arrays (memmaps, patch views, file proxies)
+    would take minutes to read: they are keyed by object identity and a
+    sample of rows instead, so in-place edits outside the sampled rows are
+    not noticed.
+    """
+
+    shape, dtype = tuple(data.shape), np.dtype(data.dtype)
+    digest = hashlib.blake2b(repr((shape, dtype.str)).encode(), digest_size=16)
+
+    if len(shape) == 0:
+        digest.update(np.ascontiguousarray(data).tobytes())
+        return digest.hexdigest()
+
+    if _is_cacheable(data) and data.nbytes <= FULL_HASH_NBYTES:
+        for start, stop in iter_row_blocks(data):
+            digest.update(np.ascontiguousarray(data[start:stop]).tobytes())
+        return digest.hexdigest()
+
+    digest.update(repr(('id', id(data))).encode())
+    for idx in np.unique(np.linspace(0, shape[0] - 1, SAMPLE_ROWS).astype(int)):
+        digest.update(np.ascontiguousarray(data[int(idx)]).tobytes())
+
+    return digest.hexdigest()
+
+def can_cache(action: str, params: dict) -> bool:
+    """Whether the output of `run_transform` with these settings is kept by
+    `ResultCache`: scratch memmaps and patch views are not."""
+
+    if params.get('use_scratch'):
+        return False
+    return not (action == 'crop' and params.get('use_views'))
+
+def get_cache_key(action: str, data, params: dict) -> Tuple:
+    args = tuple((arg, _hashable(params.get(arg))) for arg in TRANSFORM_ARGS[action] + OUTPUT_FLAGS)
+    return (fingerprint(data), action, args)
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+class ResultCache:
+    """LRU cache of transform results under a memory budget.
+
+    Least recently used results over `max_nbytes` are spilled to `.npy`
+    files in `spill_dir` (if set), which are read back as memmaps, or dropped.
+    Only in-memory arrays are cached: lazy results (e.g. patch views) hold
+    their source, and scratch memmaps would keep their files alive.
+    """
+
+    def __init__(self, max_nbytes: int = 2 * 1024**3, spill_dir: Optional[str] = None, max_spill_nbytes: int = 16 * 1024**3):
+        self.max_nbytes = max_nbytes
+        self.spill_dir = spill_dir
+        self.max_spill_nbytes = max_spill_nbytes
+
+        self._entries = OrderedDict() # key -> (output, metadata)
+        self._spilled = OrderedDict() # key -> (path, nbytes, metadata)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries) + len(self._spilled)
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._spilled
+
+    @property
+    def nbytes(self):
+        return sum(output.nbytes for output, _ in self._entries.values())
+
+    def get(self, key):
+        """Return cached (output, metadata) or None."""
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                output, metadata = self._entries[key]
+                return output, dict(metadata)
+
+            if key in self._spilled:
+                self._spilled.move_to_end(key)
+                path, _, metadata = self._spilled[key]
+                return np.load(path, mmap_mode='r'), dict(metadata)
+
+        return None
+
+    def put(self, key, output, metadata: dict) -> bool:
+        """Cache a copy of the output; returns False if it is not cacheable."""
+
+        if not _is_cacheable(output):
+            return False
+
+        # own read-only copy: the layer keeps its array, and edits to it do not leak in
+        output = output.copy()
+        output.flags.writeable = False
+
+        with self._lock:
+            self._entries[key] = (output, dict(metadata))
+            self._entries.move_to_end(key)
+            self._evict()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for path, _, _ in self._spilled.values():
+                _remove(path)
+            self._spilled.clear()
+
+    def _evict(self):
+
+        held = sum(output.nbytes for output, _ in self._entries.values())
+        while held > self.max_nbytes and self._entries:
+            key, (output, metadata) = self._entries.popitem(last=False)
+            held -= output.nbytes
+            if self.spill_dir and output.nbytes <= self.max_spill_nbytes:
+                self._spill(key, output, metadata)
+
+        spilled = sum(nbytes for _, nbytes, _ in self._spilled.values())
+        while spilled > self.max_spill_nbytes and self._spilled:
+            _, (path, nbytes, _) = self._spilled.popitem(last=False)
+            spilled -= nbytes
+            _remove(path)
+
+    def _spill(self, key, output, metadata):
+
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix='.npy', prefix='debcr-cache-', dir=self.spill_dir)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, output)
+
+        self._spilled[key] = (path, output.nbytes, metadata)
+        weakref.finalize(self, _remove, path)
+
+def _is_cacheable(output):
+    return isinstance(output, np.ndarray) and not isinstance(output, np.memmap)
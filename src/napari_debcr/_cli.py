@@ -0,0 +1,195 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from typing import List, Optional, Sequence, Tuple
+
+from ._precision import OUTPUT_DTYPES
+from ._predict import PREFETCH_DEPTH
+from ._reader import get_reader
+from ._shapes import check_predict_shape, check_transform_shape
+from ._transforms import run_transform
+from ._writer import npz_file_writer, zarr_file_writer
+
+# actions of the batch command: model-free transforms or prediction
+TRANSFORM_ACTIONS = ['normalize', 'crop']
+PREDICT_ACTIONS = ['predict', 'restore']
+
+WRITERS = {'npz': npz_file_writer, 'zarr': zarr_file_writer}
+
+_model = None # model of a worker process, loaded once
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Process image files headless, as the plugin widgets do."""
+
+    args = get_parser().parse_args(argv)
+
+    paths, missing = expand_inputs(args.inputs)
+    for path in missing:
+        print(f'Failed: {path}: no such file or folder', file=sys.stderr)
+    if not paths:
+        print('No input files found!', file=sys.stderr)
+        return 1
+
+    if args.action in PREDICT_ACTIONS and not args.weights:
+        print(f'Model weights (--weights) are needed to {args.action}.', file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    params = get_params(args)
+    workers = max(1, min(args.workers, len(paths)))
+
+    failed = 0
+    start = time.monotonic()
+    # spawn: to predict, every worker imports TensorFlow and loads the model once on its own
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(params,)) as pool:
+        futures = {pool.submit(process_file, path, args.output_dir, args.format, params): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                print(future.result())
+            except Exception as e:
+                failed += 1
+                print(f'Failed: {futures[future]}: {e}', file=sys.stderr)
+
+    failed += len(missing)
+    total = len(paths) + len(missing)
+    print(f'Processed {total - failed}/{total} files in {time.monotonic() - start:.1f} s')
+    return 1 if failed else 0
+
+def get_parser() -> argparse.ArgumentParser:
+
+    parser = argparse.ArgumentParser(prog='napari-debcr-batch',
+                                     description='Transform or restore image files with DeBCR without a viewer.')
+    parser.add_argument('inputs', nargs='+', help='input files or glob patterns (.npz, .zarr, .tif, shard folders)')
+    parser.add_argument('-a', '--action', choices=TRANSFORM_ACTIONS + PREDICT_ACTIONS, default='restore')
+    parser.add_argument('-o', '--output-dir', required=True, help='folder to write outputs to')
+    parser.add_argument('-f', '--format', choices=list(WRITERS), default='npz', help='output file format')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='number of worker processes, each with its own model copy')
+
+    model_args = parser.add_argument_group('model')
+    model_args.add_argument('-w', '--weights', help='folder with model weights (ckpt-*.index, ckpt-*.data)')
+    model_args.add_argument('-c', '--ckpt', help='checkpoint name, e.g. ckpt-10 (default: latest)')
+    model_args.add_argument('--input-size', type=int, default=128, help='model input size (patch size)')
+    model_args.add_argument('-b', '--batch-size', type=int, default=32)
+    model_args.add_argument('--prefetch', type=int, default=PREFETCH_DEPTH, help='blocks prefetched ahead')
+    model_args.add_argument('--dtype', choices=OUTPUT_DTYPES, default='float32', help='output type')
+
+    transform_args = parser.add_argument_group('transforms')
+    transform_args.add_argument('--pmin', type=float, default=0.1, help='lower normalization percentile')
+    transform_args.add_argument('--pmax', type=float, default=99.9, help='upper normalization percentile')
+    transform_args.add_argument('--overlap', type=float, nargs=2, default=(0.5, 0.5), metavar=('X', 'Y'), help='patch overlap')
+    transform_args.add_argument('--no-cosine', dest='use_cosine', action='store_false', help='stitch without cosine blending')
+    transform_args.add_argument('--low-memory', dest='use_streaming', action='store_true', help='block-wise normalization')
+
+    return parser
+
+def expand_inputs(inputs: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """Return (existing paths, missing paths); glob patterns may match nothing,
+    but named inputs must exist."""
+
+    paths, missing = [], []
+    for pattern in inputs:
+        if glob.has_magic(pattern):
+            paths += [os.path.abspath(path) for path in sorted(glob.glob(pattern))]
+        elif os.path.exists(pattern):
+            paths.append(os.path.abspath(pattern))
+        else:
+            missing.append(pattern)
+    return list(dict.fromkeys(paths)), missing # unique, in order
+
+def get_params(args) -> dict:
+
+    params = {
+        'action': args.action,
+        'batch_size': args.batch_size,
+        'prefetch_depth': args.prefetch,
+        'dtype': args.dtype,
+        'pmin': args.pmin,
+        'pmax': args.pmax,
+        'overlap': tuple(args.overlap),
+        'use_cosine': args.use_cosine,
+        'use_streaming': args.use_streaming,
+        'patch_size': args.input_size,
+    }
+    if args.action in PREDICT_ACTIONS:
+        params['weights_path'] = os.path.abspath(args.weights)
+        params['ckpt_name'] = args.ckpt or get_latest_ckpt(params['weights_path'])
+    return params
+
+def get_latest_ckpt(weights_path: str) -> str:
+
+    ckpt_names = [os.path.basename(path)[:-len('.index')] for path in glob.glob(f'{weights_path}/*.index')]
+    if not ckpt_names:
+        raise SystemExit(f'No model weights found in {weights_path}!\nExpected: ckpt-*.index, ckpt-*.data')
+    # ckpt-N: highest N is the latest
+    return max(ckpt_names, key=lambda name: int(name.rsplit('-', 1)[-1]) if name.rsplit('-', 1)[-1].isdigit() else -1)
+
+def _init_worker(params):
+
+    global _model
+    if params['action'] not in PREDICT_ACTIONS:
+        return
+
+    # imported for predict actions only: `debcr` loads TensorFlow
+    import debcr
+    _model = debcr.model.init(weights_path=params['weights_path'], input_size=params['patch_size'], ckpt_name=params['ckpt_name'])
+
+def process_file(path: str, output_dir: str, output_format: str, params: dict, model=None) -> str:
+    """Process the image layers of a file into one output file of
+    `<layer>.pred` (or `<layer>.<transform>`) layers; returns a log message."""
+
+    model = model if model is not None else _model
+    action = params['action']
+    suffix = 'pred' if action in PREDICT_ACTIONS else action
+
+    reader = get_reader(path)
+    if reader is None:
+        raise ValueError('unsupported file format')
+
+    start = time.monotonic()
+    layers_out = []
+    for data, attrs, layer_type in reader(path):
+        if layer_type != 'image':
+            continue
+        data = data[0] if attrs.get('multiscale') else data
+        output = _process_layer(action, data, params, model)
+        layers_out.append((output, {'name': f"{attrs.get('name', 'data')}.{suffix}"}, 'image'))
+
+    basename = os.path.basename(path.rstrip('/\\'))
+    for ext in ('.ome.tiff', '.ome.tif', '.tiff', '.tif', '.npz', '.zarr'):
+        if basename.lower().endswith(ext):
+            basename = basename[:-len(ext)]
+            break
+    out_path = os.path.join(output_dir, f'{basename}.{suffix}.{output_format}')
+    WRITERS[output_format](out_path, layers_out)
+
+    return f'{path} -> {out_path} ({len(layers_out)} layers, {time.monotonic() - start:.1f} s)'
+
+def _process_layer(action, data, params, model):
+
+    # same code paths as the data and prediction widgets
+    if action in TRANSFORM_ACTIONS:
+        error = check_transform_shape(action, data.shape, params['patch_size'])
+        if error is not None:
+            raise ValueError(error)
+        # outputs are written whole: no views of, or files next to, the input
+        output, _ = run_transform(action, data, dict(params, use_views=False, use_scratch=False))
+        return output
+
+    from ._restore import get_input_size, predict_stack
+    error = check_predict_shape(action, data.shape, get_input_size(model))
+    if error is not None:
+        raise ValueError(error)
+    return predict_stack(model, data, action, batch_size=params['batch_size'], overlap=params['overlap'],
+                         use_cosine=params['use_cosine'], pmin=params['pmin'], pmax=params['pmax'],
+                         prefetch_depth=params['prefetch_depth'], dtype=np.dtype(params['dtype']))
+
+if __name__ == '__main__':
+    sys.exit(main())
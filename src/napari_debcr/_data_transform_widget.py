@@ -1,12 +1,15 @@
+import fnmatch
+
 from qtpy.QtWidgets import (
     QApplication,
     QGroupBox,
     QHBoxLayout, QVBoxLayout,
     QLabel, QLineEdit,
     QPushButton, QSpinBox, QDoubleSpinBox, QCheckBox,
+    QComboBox,
     QWidget
 )
-from qtpy.QtCore import QThread, Signal
+from qtpy.QtCore import QThread, QTimer, Signal
 
 import napari
 
@@ -16,14 +19,23 @@ if TYPE_CHECKING:
 
 from ._input_data_widget import InputDataGroupBox
 from ._output_data_widget import OutputDataGroupBox
+from ._lazy import check_complete
+from ._shapes import check_transform_shape
+from ._transforms import run_transform
+from ._cache import ResultCache, can_cache, get_cache_key
+from ._batch import run_batch
+from ._scratch import SCRATCH_DIR
+from ._normalize import Histogram
+from ._preview import PREVIEW_NAME, get_slice_index, preview_crop, preview_normalize
 
-import debcr
+# delay after the last parameter change before the preview is updated (ms)
+PREVIEW_DELAY = 200
 
 class DataTransformThread(QThread):
     finished_signal = Signal()  # Signal to notify when finished
     log_signal = Signal(str) # Signal for log messages
-    result_signal = Signal(object, str)  # Signal to pass transform results (image data, image name)
-    param_signal = Signal(tuple) # Signal to update parameter patches_num
+    result_signal = Signal(object, str, dict)  # Signal to pass transform results (image data, image name, metadata)
+    param_signal = Signal(dict) # Signal to update parameters (patch_num, overlap)
     
     def __init__(self, widget, action):
         super().__init__()
@@ -34,10 +46,12 @@ class DataTransformThread(QThread):
         
         input_name = self.widget.layer_select.currentText()
         input_data = None
+        input_metadata = {}
         
         for layer in self.widget.viewer.layers:
             if isinstance(layer, napari.layers.Image) and (layer.name == input_name) and (layer.data is not None):
-                input_data = layer.data
+                input_data = layer.data[0] if layer.multiscale else layer.data
+                input_metadata = layer.metadata
                 break
         
         if input_data is None:
@@ -46,30 +60,139 @@ class DataTransformThread(QThread):
             self.finished_signal.emit()
             return
 
-        if self.action == 'crop':
-            args_list = ['overlap', 'patch_size']
-        elif self.action == 'stitch':
-            args_list = ['overlap', 'patch_num', 'use_cosine']
-        elif self.action == 'normalize':
-            args_list = ['pmin', 'pmax']
-        else:
-            args_list = []
+        params = self.widget.get_params()
         
-        run_args = {run_arg: getattr(self.widget, run_arg) for run_arg in args_list}
-
-        run_action = getattr(debcr.data, self.action)
-        output_data = run_action(input_data, **run_args)
+        # stitch patches by the grid they were cropped with
+        patch_grid = input_metadata.get('patch_grid')
+        if self.action == 'stitch' and patch_grid is not None:
+            params.update(patch_num=patch_grid.patch_num, overlap=patch_grid.overlap)
+            self.param_signal.emit({'patch_num': patch_grid.patch_num, 'overlap': patch_grid.overlap})
+            self.log_signal.emit(f'Using patch grid of {input_name}: count {patch_grid.patch_num}, overlap {patch_grid.overlap}')
+        
+        # validate shapes before any pixel data of lazy layers is read
+        error = check_complete(input_data, input_name) or \
+            check_transform_shape(self.action, input_data.shape, params['patch_size'], params['patch_num'])
+        if error is not None:
+            self.log_signal.emit(error)
+            self.log_signal.emit('Preprocessing is aborted.')
+            self.finished_signal.emit()
+            return
+        
+        # repeated runs with the same input and settings reuse the result
+        cache = self.widget.get_cache()
+        if cache is not None and not can_cache(self.action, params):
+            cache = None # lazy or disk-backed output: not even keyed
+        cache_key = get_cache_key(self.action, input_data, params) if cache is not None else None
+        cached = cache.get(cache_key) if cache is not None else None
+        
+        if cached is not None:
+            output_data, output_metadata = cached
+            self.log_signal.emit(f'Using cached result of {self.action}')
+        else:
+            output_data, output_metadata = run_transform(self.action, input_data, params)
+            if cache is not None:
+                cache.put(cache_key, output_data, output_metadata)
         
         output_name = self.widget.layer_out.text()
-        self.result_signal.emit(output_data, output_name)
+        self.result_signal.emit(output_data, output_name, output_metadata)
 
         if self.action == 'crop':
-            _,patch_num = debcr.data.crop(input_data, **run_args, dry_run=True)
-            self.param_signal.emit(patch_num)
+            self.param_signal.emit({'patch_num': output_metadata['patch_grid'].patch_num})
         
         self.log_signal.emit(f'New data shape: {output_data.shape}')
         self.finished_signal.emit()  # Notify UI when done
     
+class BatchTransformThread(QThread):
+    finished_signal = Signal()  # Signal to notify when finished
+    log_signal = Signal(str) # Signal for log messages
+    result_signal = Signal(object, str, dict)  # Signal to pass transform results (image data, image name, metadata)
+    
+    def __init__(self, widget, action):
+        super().__init__()
+        self.widget = widget
+        self.action = action
+    
+    def run(self):
+        
+        pattern = self.widget.batch_pattern.text() or '*'
+        base_params = self.widget.get_params()
+        inputs, params = {}, {}
+        
+        for layer in self.widget.viewer.layers:
+            if not isinstance(layer, napari.layers.Image) or layer.data is None:
+                continue
+            if layer.name.startswith(PREVIEW_NAME) or not fnmatch.fnmatch(layer.name, pattern):
+                continue
+            
+            input_data = layer.data[0] if layer.multiscale else layer.data
+            layer_params = dict(base_params)
+            # stitch patches by the grid they were cropped with
+            patch_grid = layer.metadata.get('patch_grid')
+            if self.action == 'stitch' and patch_grid is not None:
+                layer_params.update(patch_num=patch_grid.patch_num, overlap=patch_grid.overlap)
+            
+            error = check_complete(input_data, layer.name) or \
+                check_transform_shape(self.action, input_data.shape, layer_params['patch_size'], layer_params['patch_num'])
+            if error is not None:
+                self.log_signal.emit(f'Skipping {layer.name}: {error}')
+                continue
+            inputs[layer.name] = input_data
+            params[layer.name] = layer_params
+        
+        if not inputs:
+            self.log_signal.emit(f'No image layers match \'{pattern}\'!')
+            self.log_signal.emit('Preprocessing is aborted.')
+            self.finished_signal.emit()
+            return
+        
+        self.log_signal.emit(f'Running {self.action} on {len(inputs)} layers in parallel')
+        
+        # output name of the selected layer gives the suffix of all outputs, e.g. '.prep'
+        output_name = self.widget.layer_out.text()
+        selected_name = self.widget.layer_select.currentText()
+        if selected_name and output_name.startswith(selected_name):
+            suffix = output_name[len(selected_name):]
+        else:
+            suffix = f'.{output_name}' if output_name else '.prep'
+        
+        # results are added as soon as each layer is done
+        for input_name, output_data, output_metadata in run_batch(self.action, inputs, params):
+            self.result_signal.emit(output_data, f'{input_name}{suffix}', output_metadata)
+            self.log_signal.emit(f'Done {self.action}: {input_name}, new data shape: {output_data.shape}')
+        
+        self.finished_signal.emit()  # Notify UI when done
+
+class PreviewThread(QThread):
+    log_signal = Signal(str) # Signal for log messages
+    result_signal = Signal(object, str)  # Signal to pass preview results (data, action)
+    
+    def __init__(self, widget, action, layer, current_step):
+        super().__init__()
+        self.widget = widget
+        self.action = action
+        self.layer = layer
+        self.current_step = current_step
+    
+    def run(self):
+        
+        data = self.layer.data[0] if self.layer.multiscale else self.layer.data
+        params = self.widget.get_params()
+        
+        if self.action == 'crop':
+            error = check_transform_shape('crop', data.shape, params['patch_size'])
+            if error is not None:
+                self.log_signal.emit(error)
+                return
+            self.result_signal.emit(preview_crop(data.shape, params['patch_size'], params['overlap']), self.action)
+            return
+        
+        if data.ndim != 3:
+            return
+        # stack percentiles are computed once per layer data
+        hist = self.widget.get_preview_hist(data)
+        index = get_slice_index(self.current_step, data.shape)
+        self.result_signal.emit(preview_normalize(data, index, params['pmin'], params['pmax'], hist), self.action)
+
 class DataTransformWidget(QWidget):
     
     def __init__(self, viewer: "napari.viewer.Viewer", log_widget):
@@ -86,6 +209,12 @@ class DataTransformWidget(QWidget):
         self.use_cosine = True # default
         self.pmin = 0.1 # default
         self.pmax = 99.9 # default
+        self.use_streaming = False # default
+        self.use_views = False # default
+        self.cache = None # result cache, created on first use
+        self.preview_thread = None
+        self._preview_pending = False
+        self._preview_hist = (None, None) # (data, histogram)
         
         self._init_layout()
         
@@ -98,9 +227,21 @@ class DataTransformWidget(QWidget):
         self.layer_select = data_in_widget.layer_select
         layout.addWidget(data_in_widget)
         
+        # Layout: batch mode over layers by name pattern
+        batch_layout = QHBoxLayout()
+        self.batch_ckbox = QCheckBox("batch: all image stacks matching")
+        self.batch_ckbox.setChecked(False) # default
+        batch_layout.addWidget(self.batch_ckbox)
+        self.batch_pattern = QLineEdit()
+        self.batch_pattern.setText('*') # default
+        batch_layout.addWidget(self.batch_pattern)
+        # END Layout: batch mode
+        data_in_widget.layout().addLayout(batch_layout)
+        
         # Groupbox: output data
         data_out_widget = OutputDataGroupBox(self.viewer, "Output")
         self.layer_out = data_out_widget.layer_out
+        self.data_out_widget = data_out_widget
         layout.addWidget(data_out_widget)
         
         # update output label upon input label change 
@@ -134,6 +275,12 @@ class DataTransformWidget(QWidget):
         #########
         params_layout.addLayout(perc_layout)
         
+        # Check-box: streaming normalization
+        self.use_streaming_ckbox = QCheckBox("low-memory normalization (block-wise)")
+        self.use_streaming_ckbox.setChecked(self.use_streaming)
+        self.use_streaming_ckbox.stateChanged.connect(self._update_use_streaming)
+        params_layout.addWidget(self.use_streaming_ckbox)
+        
         #########
         # Layout: patch size
         patch_size_layout = QHBoxLayout()
@@ -194,6 +341,12 @@ class DataTransformWidget(QWidget):
         #########
         params_layout.addLayout(patch_num_layout)
 
+        # Check-box: crop into patch views
+        self.use_views_ckbox = QCheckBox("crop as patch views (no copy)")
+        self.use_views_ckbox.setChecked(self.use_views)
+        self.use_views_ckbox.stateChanged.connect(self._update_use_views)
+        params_layout.addWidget(self.use_views_ckbox)
+
         # Check-box: use cosine blending
         self.use_cosine_ckbox = QCheckBox("use cosine blending for stitching")
         self.use_cosine_ckbox.setChecked(self.use_cosine)
@@ -203,6 +356,59 @@ class DataTransformWidget(QWidget):
         params_group.setLayout(params_layout)
         layout.addWidget(params_group)
         
+        ## Groupbox: result cache
+        cache_group = QGroupBox("Result cache")
+        cache_layout = QVBoxLayout()
+        
+        # Layout: cache budget
+        cache_size_layout = QHBoxLayout()
+        self.use_cache_ckbox = QCheckBox("reuse results, up to (MB):")
+        self.use_cache_ckbox.setChecked(True) # default
+        cache_size_layout.addWidget(self.use_cache_ckbox)
+        self.cache_size_spin = QSpinBox()
+        self.cache_size_spin.setRange(0, 1024**2)
+        self.cache_size_spin.setSingleStep(512)
+        self.cache_size_spin.setValue(2048) # default
+        cache_size_layout.addWidget(self.cache_size_spin)
+        # END Layout: cache budget
+        cache_layout.addLayout(cache_size_layout)
+        
+        # Check-box: spill evicted results to disk
+        self.cache_spill_ckbox = QCheckBox("spill evicted results to scratch folder")
+        self.cache_spill_ckbox.setChecked(False) # default
+        cache_layout.addWidget(self.cache_spill_ckbox)
+        
+        cache_group.setLayout(cache_layout)
+        layout.addWidget(cache_group)
+        
+        ## Groupbox: live preview
+        preview_group = QGroupBox("Preview")
+        preview_layout = QHBoxLayout()
+        
+        self.preview_ckbox = QCheckBox("live preview of current slice:")
+        self.preview_ckbox.setChecked(False) # default
+        self.preview_ckbox.stateChanged.connect(self._toggle_preview)
+        preview_layout.addWidget(self.preview_ckbox)
+        
+        self.preview_select = QComboBox()
+        self.preview_select.addItems(['normalize', 'crop'])
+        self.preview_select.currentTextChanged.connect(self._toggle_preview)
+        preview_layout.addWidget(self.preview_select)
+        
+        preview_group.setLayout(preview_layout)
+        layout.addWidget(preview_group)
+        
+        # debounce: preview is updated once parameter changes settle
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DELAY)
+        self.preview_timer.timeout.connect(self._run_preview)
+        
+        for spin in [self.pmin_spin, self.pmax_spin, self.patch_size_spin, self.overlap_x_spin, self.overlap_y_spin]:
+            spin.valueChanged.connect(self._schedule_preview)
+        self.layer_select.currentTextChanged.connect(self._schedule_preview)
+        self.viewer.dims.events.current_step.connect(self._schedule_preview)
+        
         #########
         # Layout: normalize / crop / stitich
         run_btns_layout = QHBoxLayout()
@@ -253,26 +459,132 @@ class DataTransformWidget(QWidget):
     def _on_run_click(self, action):
         self._toggle_run_btn(False, action)
         # Run data transform in a background thread
-        self.thread = DataTransformThread(self, action)
+        if self.batch_ckbox.isChecked():
+            self.thread = BatchTransformThread(self, action)
+        else:
+            self.thread = DataTransformThread(self, action)
+            self.thread.param_signal.connect(self._update_params)
         self.thread.log_signal.connect(self.log_widget.add_log)
         self.thread.result_signal.connect(self._add_result_layer)
-        self.thread.param_signal.connect(self._update_patch_num)
         self.thread.finished_signal.connect(lambda: self._toggle_run_btn(True, action))
         self.thread.start()
 
     def _update_use_cosine(self):
         self.use_cosine = self.use_cosine_ckbox.isChecked()
     
-    def _update_patch_num(self, patch_num):
-        self.patch_num = patch_num
-        self._update_patch_num_spin()
+    def _update_use_streaming(self):
+        self.use_streaming = self.use_streaming_ckbox.isChecked()
+    
+    def _update_use_views(self):
+        self.use_views = self.use_views_ckbox.isChecked()
+    
+    def _toggle_preview(self):
+        self._remove_preview_layers()
+        self._schedule_preview()
+    
+    def _schedule_preview(self, *args):
+        if self.preview_ckbox.isChecked():
+            self.preview_timer.start() # restarts on each change
+    
+    def _run_preview(self):
+        
+        if self.preview_thread is not None and self.preview_thread.isRunning():
+            self._preview_pending = True
+            return
+        
+        input_name = self.layer_select.currentText()
+        layer = next((layer for layer in self.viewer.layers if isinstance(layer, napari.layers.Image) and layer.name == input_name), None)
+        if layer is None or layer.data is None:
+            return
+        
+        self._preview_pending = False
+        self.preview_thread = PreviewThread(self, self.preview_select.currentText(), layer, tuple(self.viewer.dims.current_step))
+        self.preview_thread.log_signal.connect(self.log_widget.add_log)
+        self.preview_thread.result_signal.connect(self._show_preview)
+        self.preview_thread.finished.connect(self._on_preview_finished)
+        self.preview_thread.start()
+    
+    def _on_preview_finished(self):
+        if self._preview_pending:
+            self._schedule_preview()
+    
+    def get_preview_hist(self, data):
+        cached_data, hist = self._preview_hist
+        if cached_data is not data:
+            hist = Histogram.from_array(data)
+            self._preview_hist = (data, hist)
+        return hist
+    
+    def _show_preview(self, data, action):
+        
+        if not self.preview_ckbox.isChecked():
+            return
+        
+        # overlay layers are updated in place, once added
+        if action == 'normalize':
+            name = f'{PREVIEW_NAME} normalize'
+            if name in self.viewer.layers:
+                self.viewer.layers[name].data = data
+            else:
+                self.viewer.add_image(data, name=name, contrast_limits=(0, 1))
+        else:
+            name = f'{PREVIEW_NAME} patches'
+            if name not in self.viewer.layers:
+                self.viewer.add_shapes(name=name, edge_color='yellow', face_color='transparent', edge_width=2)
+            layer = self.viewer.layers[name]
+            layer.selected_data = set(range(layer.nshapes))
+            layer.remove_selected()
+            layer.add_rectangles(list(data))
+    
+    def _remove_preview_layers(self):
+        for layer in list(self.viewer.layers):
+            if layer.name.startswith(PREVIEW_NAME):
+                self.viewer.layers.remove(layer)
+    
+    def get_cache(self):
+        if not self.use_cache_ckbox.isChecked():
+            return None
+        
+        if self.cache is None:
+            self.cache = ResultCache()
+        # settings apply on the next eviction
+        self.cache.max_nbytes = self.cache_size_spin.value() * 1024**2
+        self.cache.spill_dir = None
+        if self.cache_spill_ckbox.isChecked():
+            self.cache.spill_dir = self.data_out_widget.get_scratch_params()['scratch_dir'] or SCRATCH_DIR
+        return self.cache
+    
+    def get_params(self):
+        return {
+            'pmin': self.pmin,
+            'pmax': self.pmax,
+            'patch_size': self.patch_size,
+            'overlap': self.overlap,
+            'patch_num': self.patch_num,
+            'use_cosine': self.use_cosine,
+            'use_streaming': self.use_streaming,
+            'use_views': self.use_views,
+            **self.data_out_widget.get_scratch_params(),
+        }
+    
+    def _update_params(self, params):
+        if 'patch_num' in params:
+            self.patch_num = tuple(params['patch_num'])
+            self._update_patch_num_spin()
+        if 'overlap' in params:
+            self.overlap = tuple(params['overlap'])
+            self._update_overlap_spin()
         
     def _update_patch_num_spin(self):
         self.patch_nx_spin.setValue(self.patch_num[0])
         self.patch_ny_spin.setValue(self.patch_num[1])
+    
+    def _update_overlap_spin(self):
+        self.overlap_x_spin.setValue(self.overlap[0])
+        self.overlap_y_spin.setValue(self.overlap[1])
         
-    def _add_result_layer(self, image_data, image_name):
-        self.viewer.add_image(image_data, name=image_name)
+    def _add_result_layer(self, image_data, image_name, metadata):
+        self.viewer.add_image(image_data, name=image_name, metadata=metadata)
     
     def _toggle_run_btn(self, enabled, action):
         if enabled:
@@ -7,6 +7,8 @@ from qtpy.QtWidgets import (
 
 import napari
 
+from ._preview import PREVIEW_NAME
+
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     import napari
@@ -55,7 +57,7 @@ class InputDataLayout:
 
         layer_names = []
         for layer in self.viewer.layers:
-            if isinstance(layer, napari.layers.Image):
+            if isinstance(layer, napari.layers.Image) and not layer.name.startswith(PREVIEW_NAME):
                 self.layer_select.addItem(layer.name)
                 layer_names.append(layer.name)
         
@@ -0,0 +1,117 @@
+import numpy as np
+
+from typing import Optional
+
+class LazyArray:
+    """Read-only array-like, which loads data along the first axis on demand.
+
+    Subclasses implement `_read_rows(start, stop)` to return a NumPy array
+    with rows `start:stop` of the full array.
+    """
+
+    partial = False # True if rows not computed yet read as zeros: for display, not data
+
+    def __init__(self, shape, dtype):
+        self.shape = tuple(int(s) for s in shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f'{type(self).__name__}(shape={self.shape}, dtype={self.dtype})'
+
+    def __array__(self, dtype=None, copy=None):
+        data = self._read_rows(0, self.shape[0])
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data
+
+    def __getitem__(self, key):
+
+        key = _expand_key(key, self.ndim)
+        if not key:
+            return np.asarray(self)
+
+        first, rest = key[0], key[1:]
+        nrows = self.shape[0]
+
+        # single row: read only it
+        if isinstance(first, (int, np.integer)):
+            idx = int(first)
+            if idx < 0:
+                idx += nrows
+            if not 0 <= idx < nrows:
+                raise IndexError(f'index {first} is out of bounds for axis 0 with size {nrows}')
+            return self._read_rows(idx, idx + 1)[(0,) + rest]
+
+        # slice or fancy index: read the covering block of rows
+        if isinstance(first, slice):
+            start, stop, step = first.indices(nrows)
+            rows = np.arange(start, stop, step)
+        else:
+            rows = np.arange(nrows)[first]
+
+        if rows.ndim != 1:
+            return np.asarray(self)[key]
+        if rows.size == 0:
+            return np.empty((0,) + self.shape[1:], dtype=self.dtype)[(slice(None),) + rest]
+
+        row_min, row_max = int(rows.min()), int(rows.max())
+        block = self._read_rows(row_min, row_max + 1)
+        if not (isinstance(first, slice) and first.indices(nrows)[2] == 1):
+            block = block[rows - row_min]
+
+        return block[(slice(None),) + rest]
+
+    def _read_rows(self, start: int, stop: int) -> np.ndarray:
+        raise NotImplementedError
+
+def _expand_key(key, ndim):
+
+    if not isinstance(key, tuple):
+        key = (key,)
+
+    if any(k is Ellipsis for k in key):
+        pos = next(i for i, k in enumerate(key) if k is Ellipsis)
+        fill = (slice(None),) * (ndim - len(key) + 1)
+        key = key[:pos] + fill + key[pos + 1:]
+
+    return key
+
+def check_complete(data, name: str = 'data') -> Optional[str]:
+    """Error message if `data` is a partial lazy array (e.g. an on-demand
+    prediction), whose zeros must not be saved or processed as data."""
+
+    if getattr(data, 'partial', False):
+        return (f'{name} is predicted on demand and holds only the displayed slices! '
+                f'Run the prediction without "predict displayed slices only" to use it as data.')
+    return None
+
+# byte size of blocks for block-wise passes over large arrays
+BLOCK_NBYTES = 64 * 1024**2
+
+def iter_row_blocks(data, block_nbytes: int = BLOCK_NBYTES):
+    """Yield (start, stop) ranges of rows along the first axis, which hold
+    about `block_nbytes` of data each."""
+
+    shape = tuple(data.shape)
+    if len(shape) == 0:
+        return
+
+    row_nbytes = int(np.prod(shape[1:])) * np.dtype(data.dtype).itemsize
+    step = max(1, block_nbytes // max(1, row_nbytes))
+    for start in range(0, shape[0], step):
+        yield start, min(start + step, shape[0])
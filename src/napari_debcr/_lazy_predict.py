@@ -0,0 +1,167 @@
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from typing import Callable, Optional
+
+from ._lazy import LazyArray
+from ._normalize import Histogram
+from ._predict import predict_blocks
+from ._restore import get_input_size, get_predict_shape, is_tiled, restore
+
+# memory cap of predicted slices kept per lazy prediction layer
+SLICE_CACHE_NBYTES = 1024**3
+
+# number of slices on each side of the displayed one, which are predicted ahead
+PREFETCH_RADIUS = 2
+
+class LazyPredictionArray(LazyArray):
+    """(Z,X,Y) prediction, which is computed slice by slice in the background.
+
+    Reads never run the model: slices not predicted yet read as zeros and
+    are queued for a worker thread, together with the slices within
+    `prefetch_radius` of the read ones (nearest first). `on_ready()` is
+    called from the worker whenever a slice of the last read range is
+    done, e.g. to refresh a layer. Predicted slices are kept in an LRU
+    cache of up to `max_nbytes`; slices of the last read range are kept
+    first, and at most as many as fit are queued.
+
+    `predict_func(start, stop)` returns the prediction of slices start:stop.
+    The array is `partial`: writers and transforms refuse it.
+    """
+
+    partial = True
+
+    def __init__(self, predict_func: Callable, shape, dtype=np.float32,
+                 max_nbytes: int = SLICE_CACHE_NBYTES, prefetch_radius: int = PREFETCH_RADIUS,
+                 on_ready: Optional[Callable[[], None]] = None, on_error: Optional[Callable[[Exception], None]] = None):
+        super().__init__(shape, dtype)
+        self.predict_func = predict_func
+        self.max_nbytes = max_nbytes
+        self.prefetch_radius = prefetch_radius
+        self.on_ready = on_ready
+        self.on_error = on_error
+
+        self._cache = OrderedDict() # slice index -> prediction
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._focus = (0, 0)
+
+        self._executor = ThreadPoolExecutor(max_workers=1) # one model call at a time
+        weakref.finalize(self, self._executor.shutdown, wait=False)
+
+    @property
+    def cached_slices(self):
+        with self._lock:
+            return sorted(self._cache)
+
+    @property
+    def capacity(self) -> int:
+        row_nbytes = int(np.prod(self.shape[1:])) * self.dtype.itemsize
+        return max(1, self.max_nbytes // max(1, row_nbytes))
+
+    def _read_rows(self, start, stop):
+
+        rows = np.zeros((stop - start,) + self.shape[1:], dtype=self.dtype)
+        with self._lock:
+            self._focus = (start, stop)
+            for idx in range(start, stop):
+                if idx in self._cache:
+                    self._cache.move_to_end(idx)
+                    rows[idx - start] = self._cache[idx]
+            self._schedule(start, stop)
+
+        return rows
+
+    def _schedule(self, start, stop):
+
+        # read slices first, then neighbours, alternating after and before
+        radius = self.prefetch_radius
+        after = range(stop, min(stop + radius, len(self)))
+        before = range(start - 1, max(start - radius, 0) - 1, -1)
+        order = list(range(start, stop)) + [idx for pair in zip(after, before) for idx in pair]
+        order += list(after[len(before):]) + list(before[len(after):])
+
+        # no more than fit in the cache, so queued slices do not evict each other
+        budget = self.capacity - sum(idx in self._cache or idx in self._pending for idx in order)
+        for idx in order:
+            if budget <= 0:
+                break
+            if idx in self._cache or idx in self._pending:
+                continue
+            self._pending.add(idx)
+            self._executor.submit(self._predict_slice, idx)
+            budget -= 1
+
+    def _in_focus(self, idx, radius=0):
+        start, stop = self._focus
+        return start - radius <= idx < stop + radius
+
+    def _predict_slice(self, idx):
+        try:
+            with self._lock:
+                # skip slices the viewer has moved away from
+                if idx in self._cache or not self._in_focus(idx, self.prefetch_radius):
+                    return
+            pred = np.asarray(self.predict_func(idx, idx + 1), dtype=self.dtype).reshape(self.shape[1:])
+            with self._lock:
+                self._cache[idx] = pred
+                self._evict()
+                visible = self._in_focus(idx)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            return
+        finally:
+            with self._lock:
+                self._pending.discard(idx)
+
+        if visible and self.on_ready is not None:
+            self.on_ready()
+
+    def _evict(self):
+        # least recently used first, slices of the read range last
+        while len(self._cache) > self.capacity:
+            idx = next((idx for idx in self._cache if not self._in_focus(idx)), next(iter(self._cache)))
+            del self._cache[idx]
+
+def _get_runs(indices):
+    runs = []
+    for idx in indices:
+        if runs and runs[-1][1] == idx:
+            runs[-1][1] = idx + 1
+        else:
+            runs.append([idx, idx + 1])
+    return [tuple(run) for run in runs]
+
+def make_slice_predictor(model, data, action: str = 'predict', batch_size: int = 32, overlap=(0.5, 0.5),
+                         use_cosine: bool = True, pmin: Optional[float] = 0.1, pmax: Optional[float] = 99.9, dtype=np.float32):
+    """Return (predict_func, output shape) to predict slices of `data` on demand,
+    as the prediction widget would predict the whole stack.
+
+    For restoration, the percentiles of the whole stack are computed here,
+    so call it off the GUI thread.
+    """
+
+    out_shape = get_predict_shape(model, action, data.shape, overlap)
+    tiled = is_tiled(action, data.shape, get_input_size(model))
+
+    if action == 'predict' and not tiled:
+        def predict_func(start, stop):
+            return predict_blocks(model, data[start:stop], batch_size=batch_size, prefetch_depth=0, dtype=dtype)
+        return predict_func, out_shape
+
+    value_range = None
+    if action == 'restore':
+        # percentiles of the whole stack, as for a full restoration
+        hist = Histogram.from_array(data)
+        value_range = (hist.percentile(pmin), hist.percentile(pmax))
+
+    def predict_func(start, stop):
+        return restore(model, data[start:stop], batch_size=batch_size, overlap=overlap, use_cosine=use_cosine,
+                       pmin=None, pmax=None, value_range=value_range, cover=tiled, prefetch_depth=0, dtype=dtype)
+
+    return predict_func, out_shape
@@ -1,6 +1,8 @@
 import os
 import glob
+import time
 
+from qtpy.QtCore import QThread, Signal
 from qtpy.QtWidgets import (
     QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit,
@@ -12,15 +14,40 @@ from qtpy.QtWidgets import (
 
 import napari
 
+from typing import Callable, Optional
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     import napari
 
 import debcr
 
+from ._model_cache import MODEL_CACHE, TRAINED_NAME, clone_model
+from ._predict import warm_up
+
+class WarmupThread(QThread):
+    finished_signal = Signal(object, float, bool)  # Signal to notify when finished (model, seconds, succeeded)
+    log_signal = Signal(str) # Signal for log messages
+    
+    def __init__(self, model, batch_size):
+        super().__init__()
+        self.model = model
+        self.batch_size = batch_size
+    
+    def run(self):
+        start = time.monotonic()
+        try:
+            warm_up(self.model, self.batch_size)
+        except Exception as e:
+            self.log_signal.emit(f'Model warm-up failed: {e}')
+            self.finished_signal.emit(self.model, time.monotonic() - start, False)
+            return
+        self.finished_signal.emit(self.model, time.monotonic() - start, True)
+
 class LoadWeightsGroupBox(QGroupBox):
+    ready_signal = Signal(bool)  # Signal to notify whether the loaded model can be used (False while warming up)
     
-    def __init__(self, viewer: "napari.viewer.Viewer", title: str, log_widget, add_init_ckbox: bool = False):
+    def __init__(self, viewer: "napari.viewer.Viewer", title: str, log_widget, add_init_ckbox: bool = False,
+                 warmup_batch_size: Optional[Callable[[], int]] = None, private_model: bool = False):
         super().__init__(title)
         
         self.viewer = viewer
@@ -34,8 +61,12 @@ class LoadWeightsGroupBox(QGroupBox):
         self.input_size = 128
         
         self.add_init_ckbox = add_init_ckbox
+        self.private_model = private_model # own model instance, not shared with other tabs (e.g. to train)
+        self.warmup_batch_size = warmup_batch_size # batch size to warm up at, if enabled
+        self.warmup_threads = [] # kept until done, also if another model is loaded meanwhile
         
         self._init_layout()
+        MODEL_CACHE.add_listener(self._update_ckpt_dropdown) # offer models trained meanwhile
         
     def _init_layout(self):
         
@@ -101,6 +132,16 @@ class LoadWeightsGroupBox(QGroupBox):
         self.load_model_btn = QPushButton("(Re)load model") 
         self.load_model_btn.clicked.connect(self._on_load_model_click)
         layout.addWidget(self.load_model_btn)
+        
+        if self.warmup_batch_size is not None:
+            # Check-box: dummy prediction after loading
+            self.warmup_ckbox = QCheckBox("warm up model after loading")
+            self.warmup_ckbox.setChecked(True) # default
+            layout.addWidget(self.warmup_ckbox)
+        
+        # Label: model status
+        self.status_label = QLabel("model: not loaded")
+        layout.addWidget(self.status_label)
 
         self.setLayout(layout)
         self.layout = layout
@@ -133,6 +174,10 @@ class LoadWeightsGroupBox(QGroupBox):
         if not self.weights_set_path:
             return
 
+        # model trained in this session into this folder, if any
+        if MODEL_CACHE.get_trained(self.weights_set_path) is not None:
+            self.ckpt_select.addItem(TRAINED_NAME)
+        
         # Find all .index files (checkpoint files)
         ckpt_filepaths = sorted(glob.glob(f'{self.weights_set_path}/*.index'))
         
@@ -149,6 +194,8 @@ class LoadWeightsGroupBox(QGroupBox):
         if self.add_init_ckbox and self.init_ckbox.isChecked():
             self.debcr = debcr.model.init(input_size = self.input_size)
             self.log_widget.add_log('Model initialized!')
+            self.status_label.setText("model: initialized")
+            self.ready_signal.emit(True)
             print(f'Model summary:{self.debcr.summary()}')
             return
         
@@ -162,11 +209,55 @@ class LoadWeightsGroupBox(QGroupBox):
             self.log_widget.add_log(f'No model weight files (ckpt*.index, ckpt*.data) found!\nCheck weights directory path...')
             return
 
+        if selected_file == TRAINED_NAME:
+            self.debcr = MODEL_CACHE.get_trained(self.weights_set_path)
+            if self.private_model:
+                self.debcr = clone_model(self.debcr)
+            self.log_widget.add_log('Model trained in this session is loaded!')
+            self._on_model_loaded()
+            return
+        
         checkpoint_file_prefix = selected_file.replace(".index", "")
         checkpoint_prefix = str(f'{self.weights_set_path}/{checkpoint_file_prefix}')
         
-        self.debcr = debcr.model.init(weights_path=self.weights_set_path, input_size=self.input_size, ckpt_name=checkpoint_file_prefix)
-        self.log_widget.add_log('Model loaded!')
-        print(f'Model summary:{self.debcr.summary()}')
+        # built models are reused across tabs, until their checkpoint changes
+        if self.private_model:
+            self.debcr, cached = debcr.model.init(weights_path=self.weights_set_path, input_size=self.input_size, ckpt_name=checkpoint_file_prefix), False
+        else:
+            self.debcr, cached = MODEL_CACHE.load(self.weights_set_path, checkpoint_file_prefix, self.input_size, debcr.model.init)
+        if cached:
+            self.log_widget.add_log('Model loaded (cached)!')
+        else:
+            self.log_widget.add_log('Model loaded!')
+            print(f'Model summary:{self.debcr.summary()}')
 
-        self.weights_load_pref = checkpoint_prefix
\ No newline at end of file
+        self.weights_load_pref = checkpoint_prefix
+        self._on_model_loaded()
+    
+    def _on_model_loaded(self):
+        
+        if self.warmup_batch_size is None or not self.warmup_ckbox.isChecked():
+            self.status_label.setText("model: ready")
+            self.ready_signal.emit(True)
+            return
+        
+        # first prediction pays graph tracing and kernel selection: done ahead in the background
+        self.status_label.setText("model: warming up...")
+        self.ready_signal.emit(False) # no predictions on the model during its warm-up
+        self.warmup_threads = [thread for thread in self.warmup_threads if thread.isRunning()]
+        thread = WarmupThread(self.debcr, self.warmup_batch_size())
+        thread.log_signal.connect(self.log_widget.add_log)
+        thread.finished_signal.connect(self._on_warmup_finished)
+        self.warmup_threads.append(thread)
+        thread.start()
+    
+    def _on_warmup_finished(self, model, elapsed, succeeded):
+        if model is not self.debcr:
+            return # another model was loaded meanwhile
+        if not succeeded:
+            self.status_label.setText("model: warm-up failed")
+            self.log_widget.add_log('Reload the model, e.g. with a smaller batch size or without warm-up.')
+            return
+        self.status_label.setText("model: ready")
+        self.log_widget.add_log(f'Model is warmed up ({elapsed:.1f} s)')
+        self.ready_signal.emit(True)
@@ -0,0 +1,95 @@
+import os
+import glob
+import threading
+import weakref
+from collections import OrderedDict
+
+from typing import Callable, List, Optional, Tuple
+
+# number of built models kept in memory
+MAX_MODELS = 3
+
+# checkpoint list entry of a model trained in this session
+TRAINED_NAME = '(trained in this session)'
+
+class ModelCache:
+    """Process-wide LRU registry of built DeBCR models.
+
+    Models restored from checkpoints are keyed by (weights path, checkpoint
+    name, input size, checkpoint mtime), so a rewritten checkpoint is loaded
+    anew. Models trained in this session are kept per weights path.
+    """
+
+    def __init__(self, max_models: int = MAX_MODELS):
+        self.max_models = max_models
+        self._models = OrderedDict() # key -> model
+        self._trained = {} # weights path -> model
+        self._listeners: List[weakref.ref] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._models)
+
+    def load(self, weights_path: str, ckpt_name: str, input_size: int, init_func: Callable) -> Tuple[object, bool]:
+        """Return (model, cached); builds the model by `init_func` on a miss."""
+
+        key = get_model_key(weights_path, ckpt_name, input_size)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key], True
+
+        model = init_func(weights_path=weights_path, input_size=input_size, ckpt_name=ckpt_name)
+
+        with self._lock:
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+        return model, False
+
+    def set_trained(self, weights_path: str, model):
+        with self._lock:
+            self._trained[os.path.abspath(weights_path)] = model
+        for ref in list(self._listeners):
+            listener = ref()
+            if listener is None:
+                self._listeners.remove(ref)
+            else:
+                listener()
+
+    def get_trained(self, weights_path: Optional[str]):
+        if not weights_path:
+            return None
+        return self._trained.get(os.path.abspath(weights_path))
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Call `listener()` whenever a trained model is registered.
+
+        Listeners are weakly referenced, so widgets can be deleted freely.
+        """
+        ref = weakref.WeakMethod(listener) if hasattr(listener, '__self__') else weakref.ref(listener)
+        self._listeners.append(ref)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._trained.clear()
+
+def clone_model(model):
+    """Build a separate model with the same weights, e.g. to train without
+    changing a model shared with other tabs."""
+
+    import debcr
+    clone = debcr.model.init(input_size=int(model.inputs[0].shape[1]))
+    clone.set_weights(model.get_weights())
+    return clone
+
+def get_model_key(weights_path: str, ckpt_name: str, input_size: int) -> Tuple:
+    weights_path = os.path.abspath(weights_path)
+    # checkpoint files: <ckpt>.index, <ckpt>.data-*
+    ckpt_files = glob.glob(os.path.join(weights_path, glob.escape(ckpt_name) + '.*'))
+    mtime = max((os.path.getmtime(path) for path in ckpt_files), default=None)
+    return (weights_path, ckpt_name, int(input_size), mtime)
+
+MODEL_CACHE = ModelCache()
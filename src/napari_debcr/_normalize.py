@@ -0,0 +1,98 @@
+import numpy as np
+
+from ._lazy import iter_row_blocks
+
+# histogram resolution for float and wide integer data
+NUM_BINS = 2**16
+
+class Histogram:
+    """Value histogram of an array, accumulated block by block.
+
+    Exact for integer data of up to 16 bits; for other data percentiles are
+    interpolated within bins of width (max - min) / NUM_BINS.
+    """
+
+    def __init__(self, counts: np.ndarray, offset: float, bin_width: float, exact: bool, vmin: float = None, vmax: float = None):
+        self.counts = counts
+        self.cumsum = np.cumsum(counts)
+        self.offset = offset
+        self.bin_width = bin_width
+        self.exact = exact
+        # observed value range, if known
+        self.vmin = vmin
+        self.vmax = vmax
+
+    @classmethod
+    def from_array(cls, data):
+
+        dtype = np.dtype(data.dtype)
+        if dtype.kind in 'ui' and dtype.itemsize <= 2:
+            offset = int(np.iinfo(dtype).min)
+            counts = np.zeros(2**(8 * dtype.itemsize), dtype=np.int64)
+            for start, stop in iter_row_blocks(data):
+                block = np.asarray(data[start:stop]).ravel()
+                counts += np.bincount(block.astype(np.int64) - offset, minlength=counts.size)
+            return cls(counts, offset, 1, exact=True)
+
+        # first pass: value range, second pass: counts
+        vmin, vmax = np.inf, -np.inf
+        for start, stop in iter_row_blocks(data):
+            block = np.asarray(data[start:stop])
+            vmin, vmax = min(vmin, float(block.min())), max(vmax, float(block.max()))
+
+        bin_width = (vmax - vmin) / NUM_BINS or 1.0
+        counts = np.zeros(NUM_BINS, dtype=np.int64)
+        for start, stop in iter_row_blocks(data):
+            block = np.asarray(data[start:stop], dtype=np.float64).ravel()
+            bins = np.clip(((block - vmin) / bin_width).astype(np.int64), 0, NUM_BINS - 1)
+            counts += np.bincount(bins, minlength=NUM_BINS)
+
+        return cls(counts, vmin, bin_width, exact=False, vmin=vmin, vmax=vmax)
+
+    def percentile(self, q: float) -> float:
+
+        # linear interpolation between closest ranks, as in np.percentile
+        rank = q / 100 * (self.cumsum[-1] - 1)
+        lo, hi = int(np.floor(rank)), int(np.ceil(rank))
+        value_lo, value_hi = self._value_at(lo), self._value_at(hi)
+
+        return value_lo + (value_hi - value_lo) * (rank - lo)
+
+    def _value_at(self, rank):
+
+        idx = int(np.searchsorted(self.cumsum, rank, side='right'))
+        if self.exact:
+            return float(self.offset + idx)
+
+        if rank <= 0:
+            return self.vmin
+        if rank >= self.cumsum[-1] - 1:
+            return self.vmax
+
+        # assume values are spread evenly within the bin
+        before = self.cumsum[idx - 1] if idx > 0 else 0
+        frac = (rank - before + 0.5) / self.counts[idx]
+        return min(max(self.offset + (idx + frac) * self.bin_width, self.vmin), self.vmax)
+
+def normalize_streaming(data, pmin: float = 0.1, pmax: float = 99.9, out=None, eps: float = 1e-16):
+    """Normalize data to [0, 1] by percentiles with bounded memory.
+
+    Percentiles are taken from a block-wise histogram pass, and data is then
+    normalized block by block into `out` (float32 array by default; may be
+    `data` itself for in-place normalization of float data).
+    """
+
+    hist = Histogram.from_array(data)
+    dmin, dmax = hist.percentile(pmin), hist.percentile(pmax)
+
+    if out is None:
+        out = np.empty(data.shape, dtype=np.float32)
+
+    for start, stop in iter_row_blocks(data):
+        out[start:stop] = normalize_block(data[start:stop], dmin, dmax, eps)
+
+    return out
+
+def normalize_block(block, dmin: float, dmax: float, eps: float = 1e-16) -> np.ndarray:
+    """Normalize a block of data to [0, 1] by the given value range."""
+    return np.clip((np.asarray(block) - dmin) / (dmax - dmin + eps), 0, 1).astype(np.float32, copy=False)
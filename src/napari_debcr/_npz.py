@@ -0,0 +1,291 @@
+import bisect
+import struct
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from ._lazy import LazyArray
+
+# byte budget for recently decompressed rows of a single member
+ROW_CACHE_NBYTES = 64 * 1024**2
+# output bytes between saved decompressor states of a compressed member,
+# raised for large members to keep at most MAX_CHECKPOINTS (~40 kB each)
+CHECKPOINT_NBYTES = 16 * 1024**2
+MAX_CHECKPOINTS = 1024
+# byte size of compressed data fed to the decompressor at once
+READ_CHUNK_NBYTES = 64 * 1024
+# byte size of data blocks streamed into archive members
+WRITE_BLOCK_NBYTES = 64 * 1024**2
+
+class NpzMemberInfo(NamedTuple):
+    name: str
+    shape: Optional[Tuple[int, ...]] # None if the header is unreadable
+    dtype: Optional[np.dtype]
+    fortran_order: bool
+    compressed: bool
+    nbytes: int # size of the array data
+    file_nbytes: int # size of the member in the archive
+    header_nbytes: int
+
+class NpzMemberArray(LazyArray):
+    """Lazy proxy of a deflate-compressed `.npy` member of an `.npz` archive.
+
+    Rows along the first axis are decompressed on demand, so only the
+    displayed slices are ever read. Reads resume from the nearest
+    decompressor state saved on the way (see `DeflateStream`), so any row
+    costs at most one checkpoint interval of decompression, also backwards.
+    """
+
+    def __init__(self, path: str, member: str, shape, dtype, header_nbytes: int,
+                 data_offset: int, compress_size: int):
+        super().__init__(shape, dtype)
+        self.path = path
+        self.member = member
+        self.header_nbytes = header_nbytes
+        self.data_offset = data_offset
+        self.compress_size = compress_size
+
+        self._lock = threading.Lock()
+        self._stream = None
+        self._rows = OrderedDict()
+        self._rows_nbytes = 0
+
+    def _read_rows(self, start, stop):
+
+        row_shape = self.shape[1:]
+        row_nbytes = int(np.prod(row_shape)) * self.dtype.itemsize
+
+        with self._lock:
+            if stop - start == 1 and start in self._rows:
+                self._rows.move_to_end(start)
+                return self._rows[start]
+
+            if self._stream is None:
+                total_nbytes = self.header_nbytes + self.nbytes
+                self._stream = DeflateStream(open(self.path, 'rb'), self.data_offset, self.compress_size,
+                                             checkpoint_nbytes=max(CHECKPOINT_NBYTES, total_nbytes // MAX_CHECKPOINTS))
+
+            offset = self.header_nbytes + start * row_nbytes
+            buf = self._stream.read(offset, offset + (stop - start) * row_nbytes)
+
+        rows = np.frombuffer(buf, dtype=self.dtype).reshape((stop - start,) + row_shape)
+
+        if stop - start == 1 and row_nbytes <= ROW_CACHE_NBYTES:
+            with self._lock:
+                self._cache_row(start, rows, row_nbytes)
+
+        return rows
+
+    def _cache_row(self, idx, rows, row_nbytes):
+        self._rows[idx] = rows
+        self._rows_nbytes += row_nbytes
+        while self._rows_nbytes > ROW_CACHE_NBYTES:
+            self._rows.popitem(last=False)
+            self._rows_nbytes -= row_nbytes
+
+    def close(self):
+        with self._lock:
+            if self._stream is not None:
+                self._stream.fh.close()
+            self._stream = None
+            self._rows.clear()
+            self._rows_nbytes = 0
+
+class DeflateStream:
+    """Random access to a raw deflate stream of `size` bytes at `offset` in `fh`.
+
+    Deflate streams can only be decompressed forwards. As in zlib's zran
+    example, a copy of the decompressor state is saved every
+    `checkpoint_nbytes` of output the first time it is passed, and reads
+    resume from the nearest saved state (or the end of the last read)
+    before their start.
+    """
+
+    def __init__(self, fh, offset: int, size: int, checkpoint_nbytes: int = CHECKPOINT_NBYTES):
+        self.fh = fh
+        self.offset = offset
+        self.size = size
+        self.checkpoint_nbytes = checkpoint_nbytes
+
+        # (output position, input position, decompressor), by output position
+        self._checkpoints = [(0, 0, zlib.decompressobj(-zlib.MAX_WBITS))]
+        self._positions = [0]
+        # (output position, input position, decompressor, output from that position on) after the last read
+        self._cursor = None
+
+    @property
+    def num_checkpoints(self):
+        return len(self._checkpoints)
+
+    def read(self, start: int, stop: int) -> bytes:
+        """Return the decompressed bytes start:stop (fewer at the stream end)."""
+
+        out_pos, in_pos, decomp, pending = self._resume(start)
+
+        parts = []
+        while True:
+            # pending output starts at out_pos
+            if out_pos + len(pending) > start:
+                parts.append(pending[max(0, start - out_pos):stop - out_pos])
+            if out_pos + len(pending) >= stop or in_pos >= self.size or decomp.eof:
+                break
+
+            out_pos += len(pending)
+            self.fh.seek(self.offset + in_pos)
+            chunk = self.fh.read(min(READ_CHUNK_NBYTES, self.size - in_pos))
+            if not chunk:
+                break
+            in_pos += len(chunk)
+            pending = decomp.decompress(chunk)
+
+            if out_pos + len(pending) >= self._checkpoints[-1][0] + self.checkpoint_nbytes:
+                self._checkpoints.append((out_pos + len(pending), in_pos, decomp.copy()))
+                self._positions.append(out_pos + len(pending))
+
+        self._cursor = (out_pos, in_pos, decomp, pending)
+        return b''.join(parts)
+
+    def _resume(self, start):
+
+        # nearest saved state at or before start; saved states are copied, so they can be reused
+        idx = bisect.bisect_right(self._positions, start) - 1
+        out_pos, in_pos, decomp = self._checkpoints[idx]
+        if self._cursor is not None and out_pos <= self._cursor[0] <= start:
+            return self._cursor
+        return out_pos, in_pos, decomp.copy(), b''
+
+def open_npz(path: str) -> Dict[str, object]:
+    """Open all arrays of an `.npz` archive without reading pixel data.
+
+    Uncompressed members are memory-mapped, deflate-compressed members are
+    wrapped into `NpzMemberArray` proxies. Members, which can not be read
+    lazily (object arrays, unsupported header versions, other compression
+    methods), are loaded eagerly.
+    """
+
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as fh:
+        for name, info in _read_index(zf).items():
+            if info.shape is None or info.dtype.hasobject or len(info.shape) == 0 or 0 in info.shape:
+                arrays[name] = _load_member(path, name)
+            elif not info.compressed:
+                offset = _member_data_offset(fh, zf.getinfo(f'{name}.npy')) + info.header_nbytes
+                arrays[name] = np.memmap(path, dtype=info.dtype, mode='r', offset=offset,
+                                         shape=info.shape, order='F' if info.fortran_order else 'C')
+            elif info.fortran_order or zf.getinfo(f'{name}.npy').compress_type != zipfile.ZIP_DEFLATED:
+                arrays[name] = _load_member(path, name)
+            else:
+                zinfo = zf.getinfo(f'{name}.npy')
+                arrays[name] = NpzMemberArray(path, f'{name}.npy', info.shape, info.dtype, info.header_nbytes,
+                                              _member_data_offset(fh, zinfo), zinfo.compress_size)
+
+    return arrays
+
+def read_npz_index(path: str) -> Dict[str, NpzMemberInfo]:
+    """Describe the arrays of an `.npz` archive from its zip directory and
+    `.npy` headers only, without decompressing any array data.
+
+    Raises `zipfile.BadZipFile` if the file is not a zip archive.
+    """
+
+    with zipfile.ZipFile(path) as zf:
+        return _read_index(zf)
+
+def _read_index(zf):
+
+    index = {}
+    for info in zf.infolist():
+        if not info.filename.endswith('.npy'):
+            continue
+        name = info.filename[:-len('.npy')]
+        compressed = info.compress_type != zipfile.ZIP_STORED
+
+        header = _read_npy_header(zf, info)
+        if header is None:
+            index[name] = NpzMemberInfo(name, None, None, False, compressed,
+                                        0, info.compress_size, 0)
+            continue
+
+        shape, fortran_order, dtype, header_nbytes = header
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        index[name] = NpzMemberInfo(name, shape, dtype, fortran_order, compressed,
+                                    nbytes, info.compress_size, header_nbytes)
+
+    return index
+
+def write_npz(path: str, arrays: Dict[str, object], compression_level: Optional[int] = None):
+    """Write arrays into an `.npz` archive, streaming each one block by block.
+
+    With `compression_level` (0-9) members are deflate-compressed, otherwise
+    they are stored as-is, which keeps them memory-mappable by `open_npz`.
+    """
+
+    if compression_level is None:
+        zip_args = {'compression': zipfile.ZIP_STORED}
+    else:
+        zip_args = {'compression': zipfile.ZIP_DEFLATED, 'compresslevel': compression_level}
+
+    with zipfile.ZipFile(path, 'w', allowZip64=True, **zip_args) as zf:
+        for name, data in arrays.items():
+            with zf.open(f'{name}.npy', 'w', force_zip64=True) as fp:
+                _write_npy(fp, data)
+
+def _write_npy(fp, data):
+
+    dtype = np.dtype(data.dtype)
+    shape = tuple(data.shape)
+
+    if dtype.hasobject or len(shape) == 0:
+        np.lib.format.write_array(fp, np.asarray(data), allow_pickle=False)
+        return
+
+    header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape}
+    try:
+        np.lib.format.write_array_header_1_0(fp, header)
+    except ValueError:
+        np.lib.format.write_array_header_2_0(fp, header)
+
+    # read and write the source by blocks of rows along the first axis
+    row_nbytes = int(np.prod(shape[1:])) * dtype.itemsize
+    step = max(1, WRITE_BLOCK_NBYTES // max(1, row_nbytes))
+    for start in range(0, shape[0], step):
+        block = np.ascontiguousarray(data[start:start + step], dtype=dtype)
+        fp.write(memoryview(block.reshape(-1).view(np.uint8)))
+
+def _read_npy_header(zf, info):
+
+    with zf.open(info) as fp:
+        try:
+            version = np.lib.format.read_magic(fp)
+        except ValueError:
+            return None
+
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+        else:
+            return None
+
+        return shape, fortran_order, dtype, fp.tell()
+
+def _member_data_offset(fh, info):
+
+    # member data follows the local file header, whose name and extra field
+    # lengths may differ from the ones in the central directory
+    fh.seek(info.header_offset)
+    local_header = struct.unpack(zipfile.structFileHeader, fh.read(zipfile.sizeFileHeader))
+    if local_header[0] != zipfile.stringFileHeader:
+        raise ValueError(f'Bad local header for member: {info.filename}')
+    name_len, extra_len = local_header[10], local_header[11]
+
+    return info.header_offset + zipfile.sizeFileHeader + name_len + extra_len
+
+def _load_member(path, name):
+    with np.load(path) as data:
+        return data[name]
@@ -1,12 +1,17 @@
+import os
+
 from qtpy.QtWidgets import (
     QVBoxLayout, QHBoxLayout,
     QLabel,
-    QLineEdit,
+    QLineEdit, QCheckBox, QPushButton,
     QWidget, QGroupBox,
+    QFileDialog,
 )
 
 import napari
 
+from ._scratch import SCRATCH_DIR
+
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     import napari
@@ -40,11 +45,46 @@ class OutputDataLayout:
         # END Layout: Label + LineEdit
         layout.addLayout(to_layer_layout)
         
+        # Check-box: write output to a disk-backed memmap
+        self.use_scratch_ckbox = QCheckBox("keep output on disk (memory-mapped)")
+        self.use_scratch_ckbox.setChecked(False)
+        self.use_scratch_ckbox.stateChanged.connect(self._toggle_scratch)
+        layout.addWidget(self.use_scratch_ckbox)
+        
+        # Layout: scratch directory
+        scratch_layout = QHBoxLayout()
+        scratch_layout.addWidget(QLabel("scratch folder:"))
+        self.scratch_dir_field = QLineEdit()
+        self.scratch_dir_field.setText(SCRATCH_DIR) # default
+        scratch_layout.addWidget(self.scratch_dir_field)
+        self.scratch_dir_btn = QPushButton("Browse")
+        self.scratch_dir_btn.clicked.connect(self._on_set_scratch_dir_click)
+        scratch_layout.addWidget(self.scratch_dir_btn)
+        # END Layout: scratch directory
+        layout.addLayout(scratch_layout)
+        self._toggle_scratch()
+        
         #self.setLayout(layout)
         self.layout = layout
         
     def _update_layer_out(self, text):
        self.layer_out.setText(text)
+    
+    def _toggle_scratch(self):
+        enable = self.use_scratch_ckbox.isChecked()
+        self.scratch_dir_field.setEnabled(enable)
+        self.scratch_dir_btn.setEnabled(enable)
+    
+    def _on_set_scratch_dir_click(self):
+        chosen_path = QFileDialog.getExistingDirectory(None, "Choose Scratch Directory")
+        if chosen_path:
+            self.scratch_dir_field.setText(os.path.abspath(chosen_path))
+    
+    def get_scratch_params(self):
+        return {
+            'use_scratch': self.use_scratch_ckbox.isChecked(),
+            'scratch_dir': self.scratch_dir_field.text() or None,
+        }
 
 class OutputDataWidget(QWidget):
     def __init__(self, viewer: "napari.viewer.Viewer"):
@@ -55,6 +95,9 @@ class OutputDataWidget(QWidget):
     
     def _update_layer_out(self, text):
        self.widget._update_layer_out(text)
+    
+    def get_scratch_params(self):
+        return self.widget.get_scratch_params()
 
 class OutputDataGroupBox(QGroupBox):
     def __init__(self, viewer: "napari.viewer.Viewer", title):
@@ -64,4 +107,7 @@ class OutputDataGroupBox(QGroupBox):
         self.setLayout(self.widget.layout)
     
     def _update_layer_out(self, text):
-       self.widget._update_layer_out(text)
\ No newline at end of file
+       self.widget._update_layer_out(text)
+    
+    def get_scratch_params(self):
+        return self.widget.get_scratch_params()
\ No newline at end of file
@@ -0,0 +1,187 @@
+import os
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from typing import NamedTuple, Optional, Tuple
+
+from ._lazy import LazyArray
+
+class PatchGrid(NamedTuple):
+    """Layout of square patches cropped from a (Z,X,Y) image stack.
+
+    Patches are ordered by slice, then by X and then by Y origin.
+    """
+    patch_size: int
+    overlap: Tuple[float, float]
+    patch_num: Tuple[int, int] # patches per slice along (X,Y)
+    origins: Tuple[Tuple[int, ...], Tuple[int, ...]] # patch origins along (X,Y)
+    source_shape: Tuple[int, int, int]
+
+    @property
+    def num_patches(self) -> int:
+        return self.source_shape[0] * self.patch_num[0] * self.patch_num[1]
+
+    @property
+    def stitched_shape(self) -> Tuple[int, int, int]:
+        # image area covered by patches (as in `debcr.data.stitch` for regular grids)
+        (nx, ny), (over_x, over_y) = self.patch_num, self.overlap
+        if nx and ny:
+            return (self.source_shape[0], self.origins[0][-1] + self.patch_size, self.origins[1][-1] + self.patch_size)
+        sz_x = int( nx*self.patch_size*(1-over_x) + self.patch_size*over_x )
+        sz_y = int( ny*self.patch_size*(1-over_y) + self.patch_size*over_y )
+        return (self.source_shape[0], sz_x, sz_y)
+
+def get_patch_grid(shape, patch_size: int = 128, overlap=(0.5, 0.5)) -> PatchGrid:
+    """Compute the patch layout of `debcr.data.crop` from the stack shape only."""
+
+    nz, sz_x, sz_y = shape
+    over_x, over_y = overlap
+
+    nx = int( (sz_x - patch_size*over_x) // ((1-over_x)*patch_size) )
+    ny = int( (sz_y - patch_size*over_y) // ((1-over_y)*patch_size) )
+
+    return _make_grid(patch_size, (over_x, over_y), (nx, ny), (nz, sz_x, sz_y))
+
+def get_stitch_grid(shape, patch_num=(1, 1), overlap=(0.5, 0.5)) -> PatchGrid:
+    """Compute the patch layout of a (N, patch_size, patch_size) patch stack."""
+
+    num, patch_size = shape[0], shape[1]
+    nx, ny = patch_num
+    grid = _make_grid(patch_size, tuple(overlap), (nx, ny), (num // (nx * ny), 0, 0))
+
+    return grid._replace(source_shape=grid.stitched_shape)
+
+def get_cover_grid(shape, patch_size: int = 128, overlap=(0.5, 0.5)) -> PatchGrid:
+    """Compute a patch layout, which covers the whole (Z,X,Y) stack.
+
+    Patches are spaced as by `crop`, plus a last patch aligned to the far
+    edge where the regular grid falls short; images must be at least
+    patch-sized.
+    """
+
+    nz, sz_x, sz_y = shape
+    origins = tuple(_cover_origins(size, patch_size, over) for size, over in zip((sz_x, sz_y), overlap))
+
+    return PatchGrid(patch_size, tuple(overlap), (len(origins[0]), len(origins[1])), origins, (nz, sz_x, sz_y))
+
+def _cover_origins(size, patch_size, overlap):
+    step = max(1, int((1-overlap) * patch_size))
+    origins = list(range(0, size - patch_size + 1, step))
+    if origins[-1] + patch_size < size:
+        origins.append(size - patch_size)
+    return tuple(origins)
+
+def _make_grid(patch_size, overlap, patch_num, source_shape):
+
+    (over_x, over_y), (nx, ny) = overlap, patch_num
+    origins_x = tuple(int(ix * (1-over_x) * patch_size) for ix in range(nx))
+    origins_y = tuple(int(iy * (1-over_y) * patch_size) for iy in range(ny))
+
+    return PatchGrid(patch_size, overlap, patch_num, (origins_x, origins_y), source_shape)
+
+def stitch(patches, grid: PatchGrid, use_cosine: bool = True, out=None, workers: Optional[int] = None):
+    """Blend a patch stack back into a (Z,X,Y) stack, as `debcr.data.stitch`.
+
+    Patches of each slice are accumulated with a cached blending window
+    into the float32 output and normalized once by the cached inverse
+    weight map; slices are stitched in parallel threads.
+    """
+
+    nz, sz_x, sz_y = grid.stitched_shape
+    if out is None:
+        out = np.empty((nz, sz_x, sz_y), dtype=np.float32)
+
+    size = grid.patch_size
+    nx, ny = grid.patch_num
+    window = _blend_window(size, use_cosine)
+    inv_weights = _inverse_weights(size, grid.origins, use_cosine)
+
+    def stitch_slice(iz):
+        slice_patches = np.asarray(patches[iz*nx*ny:(iz+1)*nx*ny], dtype=np.float32)
+        acc = np.zeros((sz_x, sz_y), dtype=np.float32)
+        for ix, x_s in enumerate(grid.origins[0]):
+            for iy, y_s in enumerate(grid.origins[1]):
+                acc[x_s:x_s+size, y_s:y_s+size] += slice_patches[ix*ny + iy] * window
+        out[iz] = acc * inv_weights
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(stitch_slice, range(nz)))
+
+    return out
+
+@functools.lru_cache(maxsize=16)
+def _blend_window(patch_size, use_cosine):
+    if use_cosine:
+        window_1d = np.hanning(patch_size) # 1D cosine (Hann) window
+        window = np.outer(window_1d, window_1d).astype(np.float32)
+    else:
+        window = np.ones((patch_size, patch_size), dtype=np.float32)
+    window.flags.writeable = False
+    return window
+
+@functools.lru_cache(maxsize=16)
+def _inverse_weights(patch_size, origins, use_cosine):
+
+    sz_x, sz_y = origins[0][-1] + patch_size, origins[1][-1] + patch_size
+    window = _blend_window(patch_size, use_cosine)
+
+    weights = np.zeros((sz_x, sz_y), dtype=np.float64)
+    for x_s in origins[0]:
+        for y_s in origins[1]:
+            weights[x_s:x_s+patch_size, y_s:y_s+patch_size] += window
+
+    inv_weights = (1 / (weights + 1e-8)).astype(np.float32)
+    inv_weights.flags.writeable = False
+    return inv_weights
+
+class PatchArray(LazyArray):
+    """Read-only (N, patch_size, patch_size) stack of patches over a (Z,X,Y) source.
+
+    Nothing is copied on creation; a single patch is a read-only view of
+    an in-memory source, and blocks of patches are cropped on access.
+    """
+
+    def __init__(self, source, grid: PatchGrid):
+        super().__init__((grid.num_patches, grid.patch_size, grid.patch_size), source.dtype)
+        self.source = source
+        self.grid = grid
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            idx = int(key) + (len(self) if key < 0 else 0)
+            if not 0 <= idx < len(self):
+                raise IndexError(f'index {key} is out of bounds for axis 0 with size {len(self)}')
+            iz, ix, iy = self._patch_pos(idx)
+            return self._crop(self.source[iz], ix, iy)
+        return super().__getitem__(key)
+
+    def _read_rows(self, start, stop):
+
+        rows = np.empty((stop - start,) + self.shape[1:], dtype=self.dtype)
+
+        # read each source slice only once
+        iz_slice, slice_data = None, None
+        for idx in range(start, stop):
+            iz, ix, iy = self._patch_pos(idx)
+            if iz != iz_slice:
+                iz_slice, slice_data = iz, np.asarray(self.source[iz])
+            rows[idx - start] = self._crop(slice_data, ix, iy)
+
+        return rows
+
+    def _patch_pos(self, idx):
+        nx, ny = self.grid.patch_num
+        iz, ixy = divmod(idx, nx * ny)
+        ix, iy = divmod(ixy, ny)
+        return iz, ix, iy
+
+    def _crop(self, slice_data, ix, iy):
+        size = self.grid.patch_size
+        x_s, y_s = self.grid.origins[0][ix], self.grid.origins[1][iy]
+        patch = slice_data[x_s:x_s+size, y_s:y_s+size]
+        if isinstance(patch, np.ndarray) and patch.base is not None:
+            patch = patch.view()
+            patch.flags.writeable = False
+        return patch
@@ -0,0 +1,72 @@
+import weakref
+
+import numpy as np
+
+from typing import Optional
+
+# output types of prediction layers
+OUTPUT_DTYPES = ['float32', 'float16', 'uint16']
+
+# reduced-precision twins of loaded models
+_reduced_models = weakref.WeakKeyDictionary()
+
+def cast_output(pred, dtype) -> np.ndarray:
+    """Convert predictions to the output type.
+
+    For uint16, values are clipped to the normalized range [0, 1] and
+    rescaled to [0, 65535].
+    """
+
+    dtype = np.dtype(dtype)
+    pred = np.asarray(pred, dtype=np.float32) # e.g. from bfloat16
+    if dtype == np.uint16:
+        return np.round(np.clip(pred, 0, 1) * np.iinfo(np.uint16).max).astype(np.uint16)
+    return pred.astype(dtype, copy=False)
+
+def get_policy_name(model) -> str:
+    """Precision policy of a model's layers, e.g. 'mixed_float16' for reduced-precision copies."""
+    layers = getattr(model, 'layers', None) or [model]
+    return getattr(getattr(layers[-1], 'dtype_policy', None), 'name', 'float32')
+
+def get_reduced_policy() -> Optional[str]:
+    """Keras mixed-precision policy supported by this host, or None."""
+
+    import tensorflow as tf
+
+    gpus = tf.config.list_physical_devices('GPU')
+    if gpus:
+        major, _ = tf.config.experimental.get_device_details(gpus[0]).get('compute_capability', (0, 0))
+        return 'mixed_float16' if major >= 7 else None # tensor cores
+
+    # bfloat16 is emulated (slow) on CPUs without native support
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return None
+    return 'mixed_bfloat16' if ('avx512_bf16' in flags or 'amx_bf16' in flags) else None
+
+def get_reduced_model(model):
+    """Return a reduced-precision copy of a model with the same weights, or
+    None if reduced precision is not supported on this host."""
+
+    if model in _reduced_models:
+        return _reduced_models[model]
+
+    policy = get_reduced_policy()
+    if policy is None:
+        return None
+
+    import tensorflow as tf
+
+    # per-layer policy on a cloned config: the global Keras policy, shared
+    # with models built meanwhile in other threads, is left as is
+    def clone_layer(layer):
+        return layer.__class__.from_config(dict(layer.get_config(), dtype=policy))
+
+    reduced = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    # variables stay float32 under mixed policies
+    reduced.set_weights(model.get_weights())
+
+    _reduced_models[model] = reduced
+    return reduced
@@ -0,0 +1,121 @@
+import queue
+import threading
+import weakref
+
+import numpy as np
+
+from typing import Iterable, Iterator
+
+from ._precision import cast_output
+
+# number of model batches passed to a single predict call
+BLOCK_BATCHES = 8
+
+# number of input blocks prepared ahead of the model
+PREFETCH_DEPTH = 2
+
+# batch sizes each model has been warmed up at, e.g. for models shared across tabs
+_warmed_up = weakref.WeakKeyDictionary()
+
+class PredictionCancelled(Exception):
+    """Raised by a progress callback to stop prediction between blocks."""
+
+def predict_blocks(model, data, batch_size: int = 32, out=None, callback=None, prefetch_depth: int = PREFETCH_DEPTH, dtype=np.float32):
+    """Predict a stack of model-sized images block by block.
+
+    Blocks of `BLOCK_BATCHES` batches of the input (which may be a lazy
+    array, e.g. patch views) are read in a worker thread, up to
+    `prefetch_depth` blocks ahead of the model. If given,
+    `callback(done, total)` is called after each block is written to `out`.
+    Predictions are stored as `dtype` (or the type of `out`), see `cast_output`.
+    """
+
+    num = len(data)
+    block_size = batch_size * BLOCK_BATCHES
+
+    def read_blocks():
+        for start in range(0, num, block_size):
+            stop = min(start + block_size, num)
+            yield start, stop, np.asarray(data[start:stop])
+
+    # imported on use: `debcr` loads TensorFlow, e.g. in batch workers
+    import debcr
+    for start, stop, block in prefetch(read_blocks(), prefetch_depth):
+        pred = debcr.model.predict(eval_model=model, input_data=block, batch_size=batch_size)
+        # predict squeezes the batch axis of single-image blocks
+        pred = pred.reshape((stop - start,) + pred.shape[-2:])
+
+        if out is None:
+            out = np.empty((num,) + pred.shape[1:], dtype=dtype)
+        out[start:stop] = cast_output(pred, out.dtype)
+
+        if callback is not None:
+            callback(stop, num)
+
+    return out
+
+_DONE = object()
+
+def prefetch(items: Iterable, depth: int = PREFETCH_DEPTH) -> Iterator:
+    """Iterate over `items`, which are produced up to `depth` items ahead in a worker thread.
+
+    Errors of the producer are raised in the consumer; with `depth` 0 items
+    are produced in place.
+    """
+
+    if depth <= 0:
+        yield from items
+        return
+
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((None, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        # consumer is done or failed: release a producer blocked on a full buffer
+        stop.set()
+        thread.join()
+
+def warm_up(model, batch_size: int = 32) -> bool:
+    """Predict a dummy batch, so that graph tracing and kernel selection are
+    done before the first real prediction. Returns False if the model was
+    already warmed up at this batch size."""
+
+    sizes = _warmed_up.setdefault(model, set())
+    if batch_size in sizes:
+        return False
+
+    input_size = int(model.inputs[0].shape[1])
+    data = np.zeros((batch_size, input_size, input_size), dtype=np.float32)
+    import debcr
+    debcr.model.predict(eval_model=model, input_data=data, batch_size=batch_size)
+
+    sizes.add(batch_size)
+    return True
\ No newline at end of file
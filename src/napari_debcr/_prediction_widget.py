@@ -3,58 +3,193 @@ from qtpy.QtWidgets import (
     QGroupBox,
     QHBoxLayout, QVBoxLayout,
     QLabel, QLineEdit,
-    QPushButton, QSpinBox,
+    QPushButton, QSpinBox, QDoubleSpinBox, QCheckBox,
+    QComboBox, QProgressBar,
     QWidget
 )
 from qtpy.QtCore import QThread, Signal
 
+import time
+import threading
+import weakref
+
 import napari
+import numpy as np
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     import napari
 
 from ._input_data_widget import InputDataGroupBox
+from ._lazy import check_complete
+from ._lazy_predict import PREFETCH_RADIUS, SLICE_CACHE_NBYTES, LazyPredictionArray, make_slice_predictor
 from ._load_weights_widget import LoadWeightsGroupBox
 from ._output_data_widget import OutputDataGroupBox
+from ._precision import OUTPUT_DTYPES, get_policy_name, get_reduced_model
+from ._predict import PREFETCH_DEPTH, PredictionCancelled
+from ._restore import get_input_size, get_predict_shape, is_tiled, predict_stack
+from ._scratch import scratch_empty
+from ._shapes import check_predict_shape
+from ._tuning import tune_batch_size
 
-import debcr
+# minimal time between refreshes of a progressive output layer (s)
+REFRESH_INTERVAL = 0.5
 
 class PredictionThread(QThread):
     finished_signal = Signal()  # Signal to notify when finished
     log_signal = Signal(str) # Signal for log messages
     result_signal = Signal(object, str)  # Signal to pass prediction results (image data, name)
+    refresh_signal = Signal(bool)  # Signal to refresh a progressive result (final)
+    batch_signal = Signal(int)  # Signal to pass a tuned batch size
+    progress_signal = Signal(int, int, float)  # Signal to pass progress (done, total, slices per second)
     
-    def __init__(self, widget):
+    def __init__(self, widget, action='predict'):
         super().__init__()
         self.widget = widget
+        self.action = action # 'predict' or 'restore'
+        self.progressive = False
+        self._last_refresh = 0
+        self._start_time = None
+        self._cancel = threading.Event()
+    
+    def cancel(self):
+        # checked between blocks of batches
+        self._cancel.set()
     
     def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            # e.g. out of memory or disk: the UI is released, a partial output kept
+            self.log_signal.emit(f'{self.action.title()} failed: {e}')
+            if self.progressive:
+                self.refresh_signal.emit(True)
+        finally:
+            self.finished_signal.emit()  # Notify UI when done
+    
+    def _run(self):
         
         input_name = self.widget.layer_select.currentText()
         input_data = None
         
         for layer in self.widget.viewer.layers:
             if isinstance(layer, napari.layers.Image) and (layer.name == input_name) and (layer.data is not None):
-                input_data = layer.data
+                input_data = layer.data[0] if layer.multiscale else layer.data
                 break
         
         if input_data is None:
             self.log_signal.emit('No input data is loaded!')
-            self.finished_signal.emit()
             return
         
-        self.log_signal.emit(f'Running prediction on {input_name}')
+        error = check_complete(input_data, input_name)
+        if error is not None:
+            self.log_signal.emit(error)
+            self.log_signal.emit(f'{self.action.title()} is aborted.')
+            return
         
-        data_pred = debcr.model.predict(eval_model=self.widget.debcr, input_data=input_data, batch_size=self.widget.batch_spin.value())
         output_name = self.widget.layer_out.text()
+        batch_size = self.widget.batch_spin.value()
+        model = self.widget.debcr
+        dtype = np.dtype(self.widget.dtype_select.currentText()) # uint16: rescaled from [0, 1]
+        
+        if self.widget.precision_select.currentText() == 'reduced':
+            reduced_model = get_reduced_model(model)
+            if reduced_model is None:
+                self.log_signal.emit('Reduced precision is not supported on this device, using float32.')
+            else:
+                model = reduced_model
+                self.log_signal.emit(f'Using reduced precision: {get_policy_name(reduced_model)}')
+        
+        if self.widget.auto_batch_ckbox.isChecked():
+            self.log_signal.emit('Tuning batch size...')
+            budget = self.widget.memory_spin.value() * 1024**2
+            batch_size = tune_batch_size(model, max_nbytes=budget or None, log=self.log_signal.emit)
+            self.batch_signal.emit(batch_size)
+            self.log_signal.emit(f'Using batch size {batch_size}')
+        patch_size = get_input_size(model)
+        overlap = (self.widget.overlap_x_spin.value(), self.widget.overlap_y_spin.value())
+        use_cosine = self.widget.use_cosine_ckbox.isChecked()
+        prefetch_depth = self.widget.prefetch_spin.value()
+        
+        error = check_predict_shape(self.action, input_data.shape, patch_size)
+        if error is not None:
+            self.log_signal.emit(error)
+            self.log_signal.emit(f'{self.action.title()} is aborted.')
+            return
+        
+        if self.widget.on_demand_ckbox.isChecked():
+            # slices are predicted in the background as the viewer shows them;
+            # stack percentiles (restore) are computed here, off the GUI thread
+            predict_func, out_shape = make_slice_predictor(model, input_data, self.action, batch_size, overlap, use_cosine,
+                                                           self.widget.pmin_spin.value(), self.widget.pmax_spin.value(), dtype)
+            data_lazy = LazyPredictionArray(predict_func, out_shape, dtype,
+                                            max_nbytes=self.widget.slice_cache_spin.value() * 1024**2,
+                                            prefetch_radius=self.widget.radius_spin.value(),
+                                            on_error=lambda e, widget=self.widget: widget.lazy_log_signal.emit(f'On-demand prediction failed: {e}'))
+            data_ref = weakref.ref(data_lazy)
+            data_lazy.on_ready = lambda widget=self.widget: widget.lazy_ready_signal.emit(data_ref())
+            self.result_signal.emit(data_lazy, output_name)
+            self.log_signal.emit(f'Predicting displayed slices of {input_name} on demand: {output_name}')
+            return
+        
+        out_shape = get_predict_shape(model, self.action, input_data.shape, overlap)
+        
+        # preallocated output: on disk or in memory, shown while it is filled
+        scratch = self.widget.data_out_widget.get_scratch_params()
+        progressive = self.widget.progressive_ckbox.isChecked()
+        data_out = None
+        if scratch['use_scratch']:
+            data_out = scratch_empty(out_shape, dtype, scratch['scratch_dir'])
+        elif progressive:
+            data_out = np.zeros(out_shape, dtype=dtype)
+        
+        self.progressive = progressive
+        if progressive:
+            self.result_signal.emit(data_out, output_name)
+        self._start_time = time.monotonic()
+        
+        self._log_action(input_name, patch_size, overlap, is_tiled(self.action, input_data.shape, patch_size))
+        try:
+            data_pred = predict_stack(model, input_data, self.action, batch_size=batch_size, overlap=overlap, use_cosine=use_cosine,
+                                      pmin=self.widget.pmin_spin.value(), pmax=self.widget.pmax_spin.value(), out=data_out,
+                                      callback=self._on_progress, prefetch_depth=prefetch_depth, dtype=dtype) # reports progress, stops on cancel
+        except PredictionCancelled:
+            self.log_signal.emit(f'Prediction is cancelled: {output_name}' + (' (partially filled)' if progressive else ''))
+            if progressive:
+                self.refresh_signal.emit(True)
+            return
+        
+        if progressive:
+            self.refresh_signal.emit(True)
+        else:
+            self.result_signal.emit(data_pred, output_name)
+        elapsed = time.monotonic() - self._start_time
+        self.log_signal.emit(f'Prediction is finished: {output_name} ({len(input_data) / max(elapsed, 1e-9):.2f} slices/s, {elapsed:.1f} s)')
+
+    def _log_action(self, input_name, patch_size, overlap, tiled):
+        if self.action == 'restore':
+            self.log_signal.emit(f'Running restoration (normalize, crop, predict, stitch) on {input_name}')
+        elif tiled:
+            self.log_signal.emit(f'Running tiled prediction on {input_name}: {patch_size}x{patch_size} tiles, overlap {overlap}')
+        else:
+            self.log_signal.emit(f'Running prediction on {input_name}')
+    
+    def _on_progress(self, done, total):
         
-        self.result_signal.emit(data_pred, output_name)
-        self.log_signal.emit(f'Prediction is finished: {output_name}')
+        now = time.monotonic()
+        self.progress_signal.emit(done, total, done / max(now - self._start_time, 1e-9))
         
-        self.finished_signal.emit()  # Notify UI when done
+        # throttled: layer refresh re-reads the displayed slice
+        if self.progressive and now - self._last_refresh >= REFRESH_INTERVAL:
+            self._last_refresh = now
+            self.refresh_signal.emit(False)
+        
+        if self._cancel.is_set():
+            raise PredictionCancelled()
 
 class PredictionWidget(QWidget):
+    lazy_ready_signal = Signal(object)  # Signal to refresh an on-demand prediction (data), from its worker
+    lazy_log_signal = Signal(str)  # Signal for log messages of on-demand predictions
     
     def __init__(self, viewer: "napari.viewer.Viewer", log_widget):
         super().__init__()
@@ -65,8 +200,13 @@ class PredictionWidget(QWidget):
         self.layer_select = None
         self.layer_out = None
         self.debcr = None
+        self.result_layer = None
+        self.model_ready = True # False while the loaded model warms up
+        self.running = False
         
         self._init_layout()
+        self.lazy_ready_signal.connect(self._refresh_lazy_layers)
+        self.lazy_log_signal.connect(self.log_widget.add_log)
         
     def _init_layout(self):
         
@@ -78,7 +218,9 @@ class PredictionWidget(QWidget):
         layout.addWidget(data_in_widget)
 
         # Groupbox: trained model
-        weigths_widget = LoadWeightsGroupBox(self.viewer, "Trained model", self.log_widget)
+        weigths_widget = LoadWeightsGroupBox(self.viewer, "Trained model", self.log_widget,
+                                             warmup_batch_size=lambda: self.batch_spin.value())
+        weigths_widget.ready_signal.connect(self._on_model_ready)
         layout.addWidget(weigths_widget)
         
         ## Groupbox: parameters
@@ -96,12 +238,121 @@ class PredictionWidget(QWidget):
         # END Layout to setup batch size
         params_layout.addLayout(batch_layout)
         
+        # Layout: automatic batch size
+        auto_batch_layout = QHBoxLayout()
+        self.auto_batch_ckbox = QCheckBox("auto batch size, memory budget (MB):")
+        self.auto_batch_ckbox.setChecked(False) # default
+        self.auto_batch_ckbox.stateChanged.connect(lambda: self.batch_spin.setEnabled(not self.auto_batch_ckbox.isChecked()))
+        auto_batch_layout.addWidget(self.auto_batch_ckbox)
+        self.memory_spin = QSpinBox()
+        self.memory_spin.setRange(0, 1024**2) # 0: no limit
+        self.memory_spin.setSingleStep(1024)
+        self.memory_spin.setValue(4096) # default
+        auto_batch_layout.addWidget(self.memory_spin)
+        # END Layout: automatic batch size
+        params_layout.addLayout(auto_batch_layout)
+        
+        # Layout: prefetch depth
+        prefetch_layout = QHBoxLayout()
+        prefetch_layout.addWidget(QLabel("blocks prefetched ahead:"))
+        self.prefetch_spin = QSpinBox()
+        self.prefetch_spin.setRange(0, 8) # 0: no prefetching
+        self.prefetch_spin.setValue(PREFETCH_DEPTH) # default
+        prefetch_layout.addWidget(self.prefetch_spin)
+        # END Layout: prefetch depth
+        params_layout.addLayout(prefetch_layout)
+        
+        # Layout: precision and output type
+        precision_layout = QHBoxLayout()
+        precision_layout.addWidget(QLabel("precision:"))
+        self.precision_select = QComboBox()
+        self.precision_select.addItems(['float32', 'reduced'])
+        precision_layout.addWidget(self.precision_select)
+        precision_layout.addWidget(QLabel("output type:"))
+        self.dtype_select = QComboBox()
+        self.dtype_select.addItems(OUTPUT_DTYPES)
+        precision_layout.addWidget(self.dtype_select)
+        # END Layout: precision and output type
+        params_layout.addLayout(precision_layout)
+        
+        # Check-box: show output while it is computed
+        self.progressive_ckbox = QCheckBox("show output progressively")
+        self.progressive_ckbox.setChecked(False) # default
+        params_layout.addWidget(self.progressive_ckbox)
+        
+        # Layout: on-demand prediction of displayed slices
+        on_demand_layout = QHBoxLayout()
+        self.on_demand_ckbox = QCheckBox("predict displayed slices only, cache (MB):")
+        self.on_demand_ckbox.setChecked(False) # default
+        on_demand_layout.addWidget(self.on_demand_ckbox)
+        self.slice_cache_spin = QSpinBox()
+        self.slice_cache_spin.setRange(64, 1024**2)
+        self.slice_cache_spin.setSingleStep(256)
+        self.slice_cache_spin.setValue(SLICE_CACHE_NBYTES // 1024**2) # default
+        on_demand_layout.addWidget(self.slice_cache_spin)
+        on_demand_layout.addWidget(QLabel("ahead:"))
+        self.radius_spin = QSpinBox()
+        self.radius_spin.setRange(0, 16) # 0: no prefetching
+        self.radius_spin.setValue(PREFETCH_RADIUS) # default
+        on_demand_layout.addWidget(self.radius_spin)
+        # END Layout: on-demand prediction of displayed slices
+        params_layout.addLayout(on_demand_layout)
+        
         params_group.setLayout(params_layout)
         layout.addWidget(params_group)
         
+        ## Groupbox: restoration parameters
+        restore_group = QGroupBox("Tiling and restoration")
+        restore_layout = QVBoxLayout()
+        
+        # Layout: normalization percentiles
+        perc_layout = QHBoxLayout()
+        perc_layout.addWidget(QLabel("normalize by percentile (pmin,pmax):"))
+        self.pmin_spin = QDoubleSpinBox()
+        self.pmin_spin.setDecimals(2)
+        self.pmin_spin.setRange(0, 100)
+        self.pmin_spin.setSingleStep(0.1)
+        self.pmin_spin.setValue(0.1) # default
+        perc_layout.addWidget(self.pmin_spin)
+        self.pmax_spin = QDoubleSpinBox()
+        self.pmax_spin.setDecimals(2)
+        self.pmax_spin.setRange(0, 100)
+        self.pmax_spin.setSingleStep(0.1)
+        self.pmax_spin.setValue(99.9) # default
+        perc_layout.addWidget(self.pmax_spin)
+        # END Layout: normalization percentiles
+        restore_layout.addLayout(perc_layout)
+        
+        # Layout: patch overlap
+        overlap_layout = QHBoxLayout()
+        overlap_layout.addWidget(QLabel("patch overlap (X,Y):"))
+        self.overlap_x_spin = QDoubleSpinBox()
+        self.overlap_x_spin.setDecimals(2)
+        self.overlap_x_spin.setRange(0, 0.75)
+        self.overlap_x_spin.setSingleStep(0.25)
+        self.overlap_x_spin.setValue(0.50) # default
+        overlap_layout.addWidget(self.overlap_x_spin)
+        self.overlap_y_spin = QDoubleSpinBox()
+        self.overlap_y_spin.setDecimals(2)
+        self.overlap_y_spin.setRange(0, 0.75)
+        self.overlap_y_spin.setSingleStep(0.25)
+        self.overlap_y_spin.setValue(0.50) # default
+        overlap_layout.addWidget(self.overlap_y_spin)
+        # END Layout: patch overlap
+        restore_layout.addLayout(overlap_layout)
+        
+        # Check-box: use cosine blending
+        self.use_cosine_ckbox = QCheckBox("use cosine blending for stitching")
+        self.use_cosine_ckbox.setChecked(True) # default
+        restore_layout.addWidget(self.use_cosine_ckbox)
+        
+        restore_group.setLayout(restore_layout)
+        layout.addWidget(restore_group)
+        
         # Groupbox: output data
         data_out_widget = OutputDataGroupBox(self.viewer, "Output")
         self.layer_out = data_out_widget.layer_out
+        self.data_out_widget = data_out_widget
         layout.addWidget(data_out_widget)
         
         # update output label upon input label change 
@@ -113,10 +364,31 @@ class PredictionWidget(QWidget):
         self.run_btn = run_widget
         layout.addWidget(run_widget)
         
+        # Widget to run restoration
+        restore_widget = QPushButton("Run restoration")
+        restore_widget.clicked.connect(lambda: self._on_run_click(weigths_widget.debcr, 'restore'))
+        self.restore_btn = restore_widget
+        layout.addWidget(restore_widget)
+        
+        # Layout: progress and cancel
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setValue(0)
+        progress_layout.addWidget(self.progress_bar)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self._on_cancel_click)
+        progress_layout.addWidget(self.cancel_btn)
+        # END Layout: progress and cancel
+        layout.addLayout(progress_layout)
+        
+        self.progress_label = QLabel("")
+        layout.addWidget(self.progress_label)
+        
         layout.addStretch()
         self.setLayout(layout)
        
-    def _on_run_click(self, model):
+    def _on_run_click(self, model, action='predict'):
 
         self.debcr = model
         if self.debcr is None:
@@ -126,20 +398,64 @@ class PredictionWidget(QWidget):
         self._toggle_run_btn(False)
         
         # Run prediction in a background thread
-        self.thread = PredictionThread(self)
+        self.thread = PredictionThread(self, action)
         self.thread.log_signal.connect(self.log_widget.add_log)
         self.thread.result_signal.connect(self._add_result_layer)
+        self.thread.refresh_signal.connect(self._refresh_result_layer)
+        self.thread.batch_signal.connect(self.batch_spin.setValue)
+        self.thread.progress_signal.connect(self._update_progress)
         self.thread.finished_signal.connect(lambda: self._toggle_run_btn(True))
         self.thread.start()
 
+    def _on_cancel_click(self):
+        self.thread.cancel()
+        self.cancel_btn.setEnabled(False)
+        self.log_widget.add_log('Cancelling prediction after the current block...')
+    
+    def _update_progress(self, done, total, rate):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+        eta = (total - done) / rate if rate > 0 else 0
+        self.progress_label.setText(f'{done}/{total} slices, {rate:.2f} slices/s, ETA {int(eta // 60)}:{int(eta % 60):02d}')
+    
     def _add_result_layer(self, image_data, image_name):
-        self.viewer.add_image(image_data, name=image_name)
+        contrast_limits = None
+        if isinstance(image_data, LazyPredictionArray):
+            # normalized range: the data range is unknown until slices are predicted
+            contrast_limits = [0, np.iinfo(np.uint16).max] if image_data.dtype == np.uint16 else [0, 1]
+        self.result_layer = self.viewer.add_image(image_data, name=image_name, contrast_limits=contrast_limits)
+    
+    def _refresh_lazy_layers(self, data):
+        # newly predicted slices of an on-demand layer are on display
+        for layer in self.viewer.layers:
+            if data is not None and layer.data is data:
+                layer.refresh()
+    
+    def _refresh_result_layer(self, final):
+        if self.result_layer is None or self.result_layer not in self.viewer.layers:
+            return
+        self.result_layer.refresh()
+        if final:
+            self.result_layer.reset_contrast_limits()
+    
+    def _on_model_ready(self, ready):
+        self.model_ready = ready
+        if not self.running:
+            self.run_btn.setEnabled(ready)
+            self.restore_btn.setEnabled(ready)
     
     def _toggle_run_btn(self, enabled):
+        self.running = not enabled
         if enabled:
             self.run_btn.setText("Run prediction")
-            self.run_btn.setEnabled(True)
+            self.run_btn.setEnabled(self.model_ready)
+            self.restore_btn.setEnabled(self.model_ready)
+            self.cancel_btn.setEnabled(False)
         else:
             self.run_btn.setText("Running prediction...")
             self.run_btn.setEnabled(False)
+            self.restore_btn.setEnabled(False)
+            self.cancel_btn.setEnabled(True)
+            self.progress_bar.setValue(0)
+            self.progress_label.setText("")
             QApplication.processEvents()
\ No newline at end of file
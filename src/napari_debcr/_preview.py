@@ -0,0 +1,30 @@
+import numpy as np
+
+from ._normalize import Histogram, normalize_block
+from ._patches import get_patch_grid
+
+# name prefix of preview overlay layers
+PREVIEW_NAME = '[preview]'
+
+def get_slice_index(current_step, shape) -> int:
+    """Index of the displayed slice of a (Z,X,Y) layer along its first axis."""
+    # layers with fewer dims than the viewer are aligned to its last dims
+    step = current_step[len(current_step) - len(shape)] if len(current_step) >= len(shape) else 0
+    return int(np.clip(step, 0, shape[0] - 1))
+
+def preview_normalize(data, index: int, pmin: float, pmax: float, hist: Histogram = None) -> np.ndarray:
+    """Normalize one slice by the percentiles of the whole stack, as `normalize` does."""
+
+    if hist is None:
+        hist = Histogram.from_array(data)
+    return normalize_block(data[index], hist.percentile(pmin), hist.percentile(pmax))
+
+def preview_crop(shape, patch_size: int, overlap) -> np.ndarray:
+    """Corners (N,4,2) of the patches, which `crop` takes from each slice."""
+
+    grid = get_patch_grid((1,) + tuple(shape[-2:]), patch_size, tuple(overlap))
+    boxes = [
+        [[x_s, y_s], [x_s, y_s + patch_size], [x_s + patch_size, y_s + patch_size], [x_s + patch_size, y_s]]
+        for x_s in grid.origins[0] for y_s in grid.origins[1]
+    ]
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2)
@@ -1,9 +1,15 @@
 import os
+import zipfile
 import numpy as np
 
 from typing import Union, Sequence, Callable, List, Optional
 from typing import TYPE_CHECKING
 
+from ._npz import open_npz, read_npz_index
+from ._shards import list_shards, open_shards
+from ._tiff import open_tiff
+from ._zarr import open_zarr
+
 if TYPE_CHECKING:
   import napari
 
@@ -11,21 +17,94 @@ PathOrPaths = Union[str, Sequence[str]]
 ReaderFunction = Callable[[PathOrPaths], List['napari.types.LayerData']]
 
 def get_reader(path: "PathOrPaths") -> Optional["ReaderFunction"]:
-    
-    if isinstance(path, str) and path.endswith(".npz"):
+
+    if not isinstance(path, str):
+        return None
+
+    if path.endswith(".npz"):
+        # reject broken or array-less archives from headers only
+        try:
+            index = read_npz_index(path)
+        except (OSError, zipfile.BadZipFile):
+            return None
+        if not index:
+            return None
         return npz_file_reader
-    
+
+    if path.rstrip("/\\").endswith(".zarr"):
+        return zarr_reader
+
+    if path.lower().endswith((".tif", ".tiff")):
+        return tiff_file_reader
+
+    if os.path.isdir(path) and list_shards(path):
+        return shards_dir_reader
+
     return None
 
 
-def npz_file_reader(path: "PathOrPaths") -> List["LayerData"]:
-    
-    data = np.load(path)
+def npz_file_reader(path: "PathOrPaths", lazy: bool = True) -> List["LayerData"]:
+
+    index = read_npz_index(path)
+
+    # lazy: memory-map or decompress on demand only the slices on display
+    data = open_npz(path) if lazy else np.load(path)
+
+    filename,_ = os.path.splitext( os.path.basename(path) )
+    layerdata = [
+        (data[arrname], {"name": f'{filename}.{arrname}', "metadata": {"npz_member": index[arrname]}}, 'image')
+        for arrname in (data.keys() if lazy else data.files)
+    ]
+
+    return layerdata
+
+
+def zarr_reader(path: "PathOrPaths") -> List["LayerData"]:
+
+    path = path.rstrip("/\\")
+
+    # zarr arrays are chunked and read lazily by napari itself
+    data = open_zarr(path)
 
     filename,_ = os.path.splitext( os.path.basename(path) )
     layerdata = [
-        (data[arrname], {"name": f'{filename}.{arrname}'}, 'image')
-        for arrname in data.files
+        (arr, {"name": f'{filename}.{arrname}'}, 'image')
+        for arrname, arr in data.items()
     ]
-    
-    return layerdata
\ No newline at end of file
+
+    return layerdata
+
+
+def tiff_file_reader(path: "PathOrPaths") -> List["LayerData"]:
+
+    # memory-mapped or page-wise lazy levels, full resolution first
+    levels = open_tiff(path)
+    multiscale = len(levels) > 1
+
+    filename = os.path.basename(path)
+    for ext in (".ome.tiff", ".ome.tif", ".tiff", ".tif"):
+        if filename.lower().endswith(ext):
+            filename = filename[:-len(ext)]
+            break
+
+    layerdata = [
+        (levels if multiscale else levels[0], {"name": filename, "multiscale": multiscale}, 'image')
+    ]
+
+    return layerdata
+
+
+def shards_dir_reader(path: "PathOrPaths") -> List["LayerData"]:
+
+    path = path.rstrip("/\\")
+
+    # one virtual stack per array name over all ".npz" shards in the folder
+    data = open_shards(path)
+
+    dirname = os.path.basename(path)
+    layerdata = [
+        (arr, {"name": f'{dirname}.{arrname}'}, 'image')
+        for arrname, arr in data.items()
+    ]
+
+    return layerdata
@@ -0,0 +1,147 @@
+import numpy as np
+
+from typing import Optional, Tuple
+
+from ._normalize import Histogram, normalize_block
+from ._precision import cast_output
+from ._patches import PatchArray, get_cover_grid, get_patch_grid, stitch
+from ._predict import BLOCK_BATCHES, PREFETCH_DEPTH, predict_blocks, prefetch
+
+def get_input_size(model) -> int:
+    """Patch size expected by a loaded DeBCR model."""
+    return int(model.inputs[0].shape[1])
+
+def restore(model, data, batch_size: int = 32, overlap=(0.5, 0.5), use_cosine: bool = True,
+            pmin: Optional[float] = 0.1, pmax: Optional[float] = 99.9, out=None, max_patches: Optional[int] = None,
+            cover: bool = False, callback=None, prefetch_depth: int = PREFETCH_DEPTH, dtype=np.float32,
+            value_range: Optional[Tuple[float, float]] = None):
+    """Restore a (Z,X,Y) stack by normalize, crop, predict and stitch in a single pass.
+
+    Slices are processed in groups of at most `max_patches` patches
+    (`batch_size * BLOCK_BATCHES` by default): each group is normalized by
+    the global percentiles, cropped into patches, predicted and blended
+    straight into `out`, so no full-size intermediate is ever held.
+    Set `pmin`/`pmax` to None to skip normalization, or pass the
+    `value_range` (dmin, dmax) to normalize by, e.g. for parts of a stack.
+
+    By default patches are laid out as by `crop`, and the output covers
+    the same area as `stitch` would. With `cover`, the output has the
+    input size: images of any XY size are padded as needed and tiled
+    with a last patch aligned to the far edges.
+
+    If given, `callback(done, total)` is called with the number of slices
+    written to `out` after each group. Up to `prefetch_depth` groups are
+    prepared ahead in a worker thread. The output is stored as `dtype` (or
+    the type of `out`), see `cast_output`.
+    """
+
+    patch_size = get_input_size(model)
+    nz, sz_x, sz_y = data.shape
+
+    if cover and use_cosine and min(overlap) * patch_size < 2 * _cover_border(patch_size):
+        # tiles barely overlap: nothing fills in where the cosine window is near zero at tile edges
+        use_cosine = False
+
+    grid, pads = _get_layout(data.shape, patch_size, overlap, use_cosine, cover)
+    out_shape = (nz, sz_x, sz_y) if cover else grid.stitched_shape
+    padded = any(sum(pad) for pad in pads)
+
+    dmin, dmax = value_range if value_range is not None else (None, None)
+    if value_range is None and pmin is not None and pmax is not None:
+        # percentiles of the whole stack from one block-wise histogram pass
+        hist = Histogram.from_array(data)
+        dmin, dmax = hist.percentile(pmin), hist.percentile(pmax)
+
+    if out is None:
+        out = np.empty(out_shape, dtype=dtype)
+    # blend in float32, then convert
+    blend_in_place = not padded and out.dtype == np.float32
+
+    nx, ny = grid.patch_num
+    max_patches = max_patches or batch_size * BLOCK_BATCHES
+    group_size = max(1, max_patches // (nx * ny))
+
+    def prepare_groups():
+        for start in range(0, len(data), group_size):
+            stop = min(start + group_size, len(data))
+            group = np.asarray(data[start:stop])
+            if dmin is not None:
+                group = normalize_block(group, dmin, dmax)
+            if padded:
+                group = np.pad(group, [(0, 0)] + pads, mode='symmetric')
+
+            group_grid = grid._replace(source_shape=group.shape)
+            yield start, stop, group_grid, np.asarray(PatchArray(group, group_grid))
+
+    # reading, normalizing and cropping of the next groups overlap with prediction
+    for start, stop, group_grid, patches in prefetch(prepare_groups(), prefetch_depth):
+        pred = predict_blocks(model, patches, batch_size=batch_size, prefetch_depth=0)
+
+        if blend_in_place:
+            stitch(pred, group_grid, use_cosine=use_cosine, out=out[start:stop])
+        else:
+            (x_s, _), (y_s, _) = pads
+            stitched = stitch(pred, group_grid, use_cosine=use_cosine)
+            out[start:stop] = cast_output(stitched[:, x_s:x_s+out_shape[1], y_s:y_s+out_shape[2]], out.dtype)
+
+        if callback is not None:
+            callback(stop, len(data))
+
+    return out
+
+def predict_stack(model, data, action: str = 'predict', batch_size: int = 32, overlap=(0.5, 0.5), use_cosine: bool = True,
+                  pmin: float = 0.1, pmax: float = 99.9, out=None, callback=None, prefetch_depth: int = PREFETCH_DEPTH, dtype=np.float32):
+    """Predict a stack as the prediction widget does.
+
+    'restore' normalizes, crops, predicts and stitches. 'predict' predicts
+    model-sized images as they are and tiles others to cover the image.
+    """
+
+    if action == 'restore':
+        # fused: only a bounded group of patches is in memory at a time
+        return restore(model, data, batch_size=batch_size, overlap=overlap, use_cosine=use_cosine, pmin=pmin, pmax=pmax,
+                       out=out, callback=callback, prefetch_depth=prefetch_depth, dtype=dtype)
+
+    if is_tiled(action, data.shape, get_input_size(model)):
+        # tiles are cut, predicted and blended in bounded groups
+        return restore(model, data, batch_size=batch_size, overlap=overlap, use_cosine=use_cosine, pmin=None, pmax=None,
+                       out=out, cover=True, callback=callback, prefetch_depth=prefetch_depth, dtype=dtype)
+
+    # block-wise: lazy inputs (e.g. patch views) are read one block at a time
+    return predict_blocks(model, data, batch_size=batch_size, out=out, callback=callback, prefetch_depth=prefetch_depth, dtype=dtype)
+
+def is_tiled(action: str, shape, patch_size: int) -> bool:
+    return action == 'predict' and tuple(shape[-2:]) != (patch_size, patch_size)
+
+def get_predict_shape(model, action: str, shape, overlap=(0.5, 0.5)):
+    """Output shape of `predict_stack` for an input of the given shape."""
+
+    tiled = is_tiled(action, shape, get_input_size(model))
+    if action == 'restore' or tiled:
+        return get_restore_shape(model, shape, overlap, cover=tiled)
+    return (shape[0],) + tuple(shape[-2:]) # model output has the input XY size
+
+def get_restore_shape(model, shape, overlap=(0.5, 0.5), cover: bool = False):
+    """Output shape of `restore` for an input of the given shape."""
+
+    if cover:
+        return tuple(shape)
+    grid, _ = _get_layout(shape, get_input_size(model), overlap, True, cover)
+    return grid.stitched_shape
+
+def _get_layout(shape, patch_size, overlap, use_cosine, cover):
+
+    if not cover:
+        return get_patch_grid(shape, patch_size, tuple(overlap)), [(0, 0), (0, 0)]
+
+    # pad images smaller than a patch, and past the near-zero rim of the
+    # cosine window, so that image borders keep a significant blending weight
+    nz, sz_x, sz_y = shape
+    border = _cover_border(patch_size) if use_cosine else 0
+    pads = [(border, border + max(patch_size - size - 2*border, 0)) for size in (sz_x, sz_y)]
+    grid = get_cover_grid((nz, sz_x + sum(pads[0]), sz_y + sum(pads[1])), patch_size, tuple(overlap))
+
+    return grid, pads
+
+def _cover_border(patch_size):
+    return max(1, patch_size // 16)
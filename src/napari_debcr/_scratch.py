@@ -0,0 +1,41 @@
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+from typing import Optional
+
+# default folder for disk-backed outputs
+SCRATCH_DIR = os.path.join(tempfile.gettempdir(), 'napari-debcr')
+
+def scratch_empty(shape, dtype=np.float32, scratch_dir: Optional[str] = None) -> np.memmap:
+    """Allocate an uninitialized array in a temporary file of the scratch folder.
+
+    The file is removed once the returned memmap and all its views are
+    garbage-collected, or at interpreter exit.
+    """
+
+    scratch_dir = scratch_dir or SCRATCH_DIR
+    os.makedirs(scratch_dir, exist_ok=True)
+
+    fd, path = tempfile.mkstemp(suffix='.dat', prefix='debcr-', dir=scratch_dir)
+    os.close(fd)
+
+    try:
+        if int(np.prod(shape)) == 0:
+            array = np.empty(shape, dtype=dtype) # memmap can not map empty files
+        else:
+            array = np.memmap(path, dtype=dtype, mode='w+', shape=tuple(shape))
+    except BaseException:
+        _remove(path)
+        raise
+
+    weakref.finalize(array, _remove, path)
+    return array
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass # e.g. still mapped on Windows
@@ -0,0 +1,53 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+# Shape checks, which only need array shapes (e.g. from `.npy` headers)
+# and fail fast before any pixel data is read.
+
+def check_transform_shape(action: str, shape: Tuple[int, ...], patch_size: int = None, patch_num: Tuple[int, int] = None) -> Optional[str]:
+
+    if action not in ('crop', 'stitch'):
+        return None
+
+    if len(shape) != 3:
+        return f'Expected a 3D image stack (Z,X,Y) to {action}, got shape: {shape}'
+
+    if action == 'crop':
+        if min(shape[1:]) < patch_size:
+            return f'Image size {shape[1:]} is smaller than patch size {patch_size}!'
+    else:
+        if shape[1] != shape[2]:
+            return f'Patches to stitch are non-square: {shape[1:]}'
+        nx, ny = patch_num
+        if shape[0] % (nx * ny) != 0:
+            return f'Number of patches {shape[0]} is not a multiple of patch count (X,Y): {patch_num}'
+
+    return None
+
+def check_predict_shape(action: str, shape: Tuple[int, ...], patch_size: int) -> Optional[str]:
+
+    if action == 'restore':
+        return check_transform_shape('crop', shape, patch_size)
+
+    # predict: non-model-sized stacks are tiled
+    if tuple(shape[-2:]) != (patch_size, patch_size) and len(shape) != 3:
+        return f'Expected a 3D image stack (Z,X,Y) to predict, got shape: {shape}'
+
+    return None
+
+def check_training_shapes(shapes: Dict[str, Tuple[int, ...]], pairs: Sequence[Tuple[str, str]] = ()) -> Optional[str]:
+
+    labels = list(shapes)
+    expected_shape = shapes[labels[0]][-2:]
+    for label in labels:
+        shape = shapes[label][-2:]
+        if shape[0] != shape[1]:
+            return f'\'{label}\' images are non-square: {shape}'
+        if shape != expected_shape:
+            return f'\'{label}\' shape {shape} and \'{labels[0]}\' shape {expected_shape} are different!'
+
+    # input/target stacks are used pairwise, so they must match entirely
+    for input_label, target_label in pairs:
+        if shapes[input_label] != shapes[target_label]:
+            return f'\'{input_label}\' shape {shapes[input_label]} and \'{target_label}\' shape {shapes[target_label]} are different!'
+
+    return None
@@ -0,0 +1,97 @@
+import os
+import re
+import glob
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from typing import Dict, List
+
+from ._lazy import LazyArray
+from ._npz import open_npz, read_npz_index
+
+# number of shards kept open per virtual stack
+MAX_OPEN_SHARDS = 8
+
+class ShardedArray(LazyArray):
+    """Virtual stack of equally shaped `.npz` shards along the first axis.
+
+    Shards are opened lazily only when their rows are accessed, and only
+    a few recently used ones are kept open.
+    """
+
+    def __init__(self, paths: List[str], member: str, lengths: List[int], row_shape, dtype):
+        super().__init__((sum(lengths),) + tuple(row_shape), dtype)
+        self.paths = paths
+        self.member = member
+        self.offsets = np.cumsum([0] + list(lengths))
+
+        self._lock = threading.Lock()
+        self._shards = OrderedDict()
+
+    def _read_rows(self, start, stop):
+
+        rows = np.empty((stop - start,) + self.shape[1:], dtype=self.dtype)
+
+        shard_idx = int(np.searchsorted(self.offsets, start, side='right')) - 1
+        pos = start
+        while pos < stop:
+            shard_start, shard_stop = self.offsets[shard_idx], self.offsets[shard_idx + 1]
+            end = min(stop, shard_stop)
+            shard = self._get_shard(shard_idx)
+            rows[pos - start:end - start] = shard[pos - shard_start:end - shard_start]
+            pos = end
+            shard_idx += 1
+
+        return rows
+
+    def _get_shard(self, shard_idx):
+        with self._lock:
+            if shard_idx in self._shards:
+                self._shards.move_to_end(shard_idx)
+            else:
+                self._shards[shard_idx] = open_npz(self.paths[shard_idx])[self.member]
+                if len(self._shards) > MAX_OPEN_SHARDS:
+                    self._shards.popitem(last=False)
+            return self._shards[shard_idx]
+
+def list_shards(dirpath: str) -> List[str]:
+    # natural sort: "t2.npz" goes before "t10.npz"
+    def natural_key(path):
+        return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', os.path.basename(path))]
+    return sorted(glob.glob(os.path.join(dirpath, '*.npz')), key=natural_key)
+
+def open_shards(dirpath: str) -> Dict[str, ShardedArray]:
+    """Open a directory of `.npz` shards as one virtual stack per array name.
+
+    Only the shard headers are read here. All shards must contain the same
+    arrays with equal shapes (except for the first axis) and dtypes.
+    """
+
+    paths = list_shards(dirpath)
+    if not paths:
+        raise ValueError(f'No ".npz" shards found in: {dirpath}')
+
+    indices = [read_npz_index(path) for path in paths]
+    members = list(indices[0])
+
+    stacks = {}
+    for member in members:
+        infos = []
+        for path, index in zip(paths, indices):
+            info = index.get(member)
+            if info is None or info.shape is None or len(info.shape) == 0:
+                raise ValueError(f'Shard {os.path.basename(path)} has no readable array \'{member}\'')
+            infos.append(info)
+
+        row_shape, dtype = infos[0].shape[1:], infos[0].dtype
+        for path, info in zip(paths, infos):
+            if info.shape[1:] != row_shape or info.dtype != dtype:
+                raise ValueError(f'Shard {os.path.basename(path)} array \'{member}\' has shape {info.shape} and dtype {info.dtype}, '
+                                 f'expected (*, {", ".join(map(str, row_shape))}) and {dtype}')
+
+        lengths = [info.shape[0] for info in infos]
+        stacks[member] = ShardedArray(paths, member, lengths, row_shape, dtype)
+
+    return stacks
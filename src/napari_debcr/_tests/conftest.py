@@ -0,0 +1,20 @@
+import types
+
+import numpy as np
+import pytest
+
+
+class ScaleModel:
+    """Stand-in for a DeBCR model, which doubles its input."""
+
+    def __init__(self, input_size):
+        self.inputs = [types.SimpleNamespace(shape=(None, input_size, input_size, 1))]
+
+    def predict(self, inputs, batch_size=32, **kwargs):
+        return [2 * np.asarray(inputs[0], dtype=np.float32)]
+
+
+@pytest.fixture
+def scale_model():
+    """Model stand-in class: `scale_model(input_size)` doubles its input."""
+    return ScaleModel
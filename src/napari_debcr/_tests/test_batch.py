@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+
+def test_run_batch_matches_single():
+    from napari_debcr._batch import run_batch
+    from napari_debcr._transforms import run_transform
+
+    params = {'pmin': 1, 'pmax': 99, 'patch_size': 64, 'overlap': (0.5, 0.5), 'patch_num': (1, 1), 'use_cosine': True}
+    inputs = {f'stack{i}': np.random.rand(2, 128, 128).astype(np.float32) for i in range(3)}
+
+    results = {name: (output, metadata) for name, output, metadata in run_batch('crop', inputs, {name: params for name in inputs}, workers=2)}
+    assert sorted(results) == sorted(inputs)
+
+    for name, data in inputs.items():
+        expected, expected_metadata = run_transform('crop', data, params)
+        output, metadata = results[name]
+        np.testing.assert_array_equal(output, expected)
+        assert metadata == expected_metadata
+
+
+def _heavy_modules():
+    import sys
+    import napari_debcr._batch # noqa: F401
+    return [name for name in ('qtpy', 'napari', 'debcr', 'tensorflow') if name in sys.modules]
+
+
+def test_batch_workers_are_light():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawned workers load neither Qt nor TensorFlow for model-free transforms
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        assert pool.submit(_heavy_modules).result() == []
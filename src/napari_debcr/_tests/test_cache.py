@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+
+def test_fingerprint():
+    from napari_debcr._cache import fingerprint
+
+    data = np.random.rand(8, 16, 16).astype(np.float32)
+
+    assert fingerprint(data) == fingerprint(data.copy())
+    assert fingerprint(data) != fingerprint(data.astype(np.float64))
+    assert fingerprint(data) != fingerprint(data.reshape(16, 8, 16))
+
+    changed = data.copy()
+    changed[5, 3, 3] += 1
+    assert fingerprint(data) != fingerprint(changed)
+
+
+def test_fingerprint_large_or_lazy(monkeypatch):
+    from napari_debcr import _cache
+    from napari_debcr._patches import PatchArray, get_patch_grid
+
+    monkeypatch.setattr(_cache, 'FULL_HASH_NBYTES', 1024)
+    data = np.random.rand(64, 16, 16).astype(np.float32)
+
+    # keyed by identity and sampled rows, not read in full
+    key = _cache.fingerprint(data)
+    assert key != _cache.fingerprint(data.copy())
+    data[0] += 1
+    assert key != _cache.fingerprint(data)
+
+    views = PatchArray(data, get_patch_grid(data.shape, patch_size=8))
+    assert _cache.fingerprint(views) == _cache.fingerprint(views)
+
+
+def test_can_cache():
+    from napari_debcr._cache import can_cache
+
+    assert can_cache('crop', {'use_views': False})
+    assert can_cache('normalize', {'use_views': True, 'use_streaming': True})
+    assert not can_cache('crop', {'use_views': True})
+    assert not can_cache('stitch', {'use_scratch': True})
+
+
+@pytest.mark.parametrize("spill", [False, True])
+def test_result_cache_lru(tmp_path, spill):
+    from napari_debcr._cache import ResultCache
+
+    block = np.zeros((4, 32, 32), dtype=np.float32) # 16 KB
+    cache = ResultCache(max_nbytes=2 * block.nbytes, spill_dir=str(tmp_path) if spill else None)
+
+    for key in 'abc':
+        cache.put(key, block + ord(key), {'key': key})
+    assert cache.get('missing') is None
+    assert cache.nbytes <= 2 * block.nbytes
+
+    # least recently used result is evicted first
+    output, metadata = cache.get('c')
+    assert metadata == {'key': 'c'} and not output.flags.writeable
+    if spill:
+        output, _ = cache.get('a')
+        assert isinstance(output, np.memmap)
+        np.testing.assert_array_equal(output, block + ord('a'))
+    else:
+        assert cache.get('a') is None
+
+    cache.clear()
+    assert len(cache) == 0 and list(tmp_path.iterdir()) == []
+
+
+def test_result_cache_outputs(tmp_path):
+    from napari_debcr._cache import ResultCache
+    from napari_debcr._patches import PatchArray, get_patch_grid
+    from napari_debcr._scratch import scratch_empty
+
+    cache = ResultCache()
+    layer_data = np.ones((2, 64, 64), dtype=np.float32)
+
+    # cached results are copies: the layer array stays writeable and unshared
+    assert cache.put('a', layer_data, {})
+    assert layer_data.flags.writeable
+    layer_data[0] = 5
+    output, _ = cache.get('a')
+    assert not output.flags.writeable and np.all(output == 1)
+
+    # patch views and scratch memmaps are not kept alive by the cache
+    views = PatchArray(layer_data, get_patch_grid(layer_data.shape, patch_size=32))
+    assert not cache.put('views', views, {})
+    assert not cache.put('scratch', scratch_empty((2, 8, 8), scratch_dir=str(tmp_path)), {})
+    assert len(cache) == 1
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+
+def test_expand_inputs(tmp_path):
+    from napari_debcr._cli import expand_inputs
+
+    for name in ['b.npz', 'a.npz', 'c.tif']:
+        (tmp_path / name).write_bytes(b'')
+
+    paths, missing = expand_inputs([str(tmp_path / '*.npz'), str(tmp_path / 'a.npz'), str(tmp_path / 'missing.npz'),
+                                    str(tmp_path / '*.zarr')])
+    assert paths == [str(tmp_path / 'a.npz'), str(tmp_path / 'b.npz')]
+    # named inputs are reported when missing, patterns may match nothing
+    assert missing == [str(tmp_path / 'missing.npz')]
+
+
+def _crop_in_worker(path, output_dir):
+    import sys
+    from napari_debcr._cli import _init_worker, get_params, get_parser, process_file
+
+    params = get_params(get_parser().parse_args([path, '-a', 'crop', '-o', output_dir, '--input-size', '32']))
+    _init_worker(params)
+    process_file(path, output_dir, 'npz', params)
+    return [name for name in ('qtpy', 'napari', 'debcr', 'tensorflow') if name in sys.modules]
+
+
+def test_cli_workers_are_light(tmp_path):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    np.savez(tmp_path / 'stack.npz', low=np.random.rand(2, 64, 64).astype(np.float32))
+
+    # spawned workers load neither Qt nor TensorFlow for model-free transforms
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        assert pool.submit(_crop_in_worker, str(tmp_path / 'stack.npz'), str(tmp_path)).result() == []
+    assert (tmp_path / 'stack.crop.npz').exists()
+
+
+@pytest.mark.parametrize("action", ["restore", "predict", "normalize"])
+def test_process_file_matches_widgets(tmp_path, action, scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._cli import get_parser, get_params, process_file
+    from napari_debcr._restore import predict_stack
+    from napari_debcr._transforms import run_transform
+
+    data = 1000 * np.random.rand(3, 64, 64).astype(np.float32)
+    np.savez(tmp_path / 'stack.npz', low=data)
+    model = scale_model(32)
+
+    # the model is passed in, instead of being loaded from weights by a worker
+    args = get_parser().parse_args([str(tmp_path / 'stack.npz'), '-a', action, '-o', str(tmp_path / 'out'),
+                                    '-w', str(tmp_path), '-c', 'ckpt-1', '--input-size', '32', '--pmin', '1', '--pmax', '99'])
+    params = get_params(args)
+    os.makedirs(tmp_path / 'out')
+    process_file(str(tmp_path / 'stack.npz'), str(tmp_path / 'out'), 'npz', params, model=model)
+
+    suffix = 'pred' if action != 'normalize' else 'normalize'
+    with np.load(tmp_path / 'out' / f'stack.{suffix}.npz') as output:
+        assert output.files == [f'stack.low.{suffix}']
+        result = output[f'stack.low.{suffix}']
+
+    if action == 'normalize':
+        expected, _ = run_transform('normalize', data, params)
+    else:
+        expected = predict_stack(model, data, action, pmin=1, pmax=99)
+    np.testing.assert_array_equal(result, expected)
+
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+
+from napari_debcr._model_cache import ModelCache
+
+
+def test_model_cache(tmp_path):
+    for name in ['ckpt-1', 'ckpt-2']:
+        (tmp_path / f'{name}.index').write_bytes(b'')
+
+    built = []
+    def init(weights_path, input_size, ckpt_name):
+        built.append((ckpt_name, input_size))
+        return object()
+
+    cache = ModelCache(max_models=2)
+    model, cached = cache.load(str(tmp_path), 'ckpt-1', 128, init)
+    assert not cached
+    assert cache.load(str(tmp_path), 'ckpt-1', 128, init) == (model, True)
+
+    cache.load(str(tmp_path), 'ckpt-1', 64, init)
+    cache.load(str(tmp_path), 'ckpt-2', 128, init)
+    assert len(cache) == 2 and len(built) == 3
+
+    # rewritten checkpoints are loaded anew
+    stat = os.stat(tmp_path / 'ckpt-2.index')
+    os.utime(tmp_path / 'ckpt-2.index', (stat.st_atime, stat.st_mtime + 10))
+    _, cached = cache.load(str(tmp_path), 'ckpt-2', 128, init)
+    assert not cached and len(built) == 4
+
+
+def test_trained_models(tmp_path):
+    cache = ModelCache()
+    calls = []
+
+    class Listener:
+        def refresh(self):
+            calls.append(True)
+
+    listener = Listener()
+    cache.add_listener(listener.refresh)
+
+    model = object()
+    cache.set_trained(str(tmp_path), model)
+    assert cache.get_trained(str(tmp_path / '.')) is model and calls == [True]
+
+    del listener # listeners are weakly referenced
+    cache.set_trained(str(tmp_path), model)
+    assert calls == [True]
+
+
+def test_clone_model():
+    debcr = pytest.importorskip("debcr")
+    from napari_debcr._model_cache import clone_model
+
+    model = debcr.model.init(input_size=32)
+    clone = clone_model(model)
+
+    # same weights, separate variables
+    assert clone is not model
+    for weights, cloned in zip(model.get_weights(), clone.get_weights()):
+        np.testing.assert_array_equal(weights, cloned)
+    clone.set_weights([w + 1 for w in clone.get_weights()])
+    assert not np.array_equal(model.get_weights()[0], clone.get_weights()[0])
@@ -0,0 +1,35 @@
+import numpy as np
+
+from napari_debcr._normalize import Histogram, normalize_streaming
+
+
+def test_histogram_percentile_exact_for_integers():
+    data = np.random.randint(0, 4096, (10, 32, 32)).astype(np.uint16)
+
+    hist = Histogram.from_array(data)
+    for q in (0, 0.1, 37.5, 99.9, 100):
+        assert hist.percentile(q) == np.percentile(data, q)
+
+
+def test_histogram_percentile_floats():
+    data = np.random.gamma(2.0, 100.0, (10, 32, 32)).astype(np.float32)
+
+    hist = Histogram.from_array(data)
+    tolerance = (data.max() - data.min()) / 2**16
+    for q in (0, 0.1, 50, 99.9, 100):
+        assert abs(hist.percentile(q) - np.percentile(data, q)) <= tolerance
+
+
+def test_normalize_streaming():
+    data = np.random.randint(0, 4096, (10, 32, 32)).astype(np.uint16)
+    dmin, dmax = np.percentile(data, (0.1, 99.9))
+    expected = np.clip((data - dmin) / (dmax - dmin + 1e-16), 0, 1)
+
+    output = normalize_streaming(data, pmin=0.1, pmax=99.9)
+    assert output.dtype == np.float32 and output.shape == data.shape
+    np.testing.assert_allclose(output, expected, atol=1e-6)
+
+    # in place for float data (approximate percentiles)
+    data_float = data.astype(np.float32)
+    assert normalize_streaming(data_float, out=data_float) is data_float
+    np.testing.assert_allclose(data_float, expected, atol=1e-4)
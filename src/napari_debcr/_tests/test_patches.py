@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from napari_debcr._patches import PatchArray, get_cover_grid, get_patch_grid, get_stitch_grid, stitch
+
+
+def test_patch_grid():
+    grid = get_patch_grid((3, 300, 200), patch_size=128, overlap=(0.5, 0.25))
+
+    assert grid.patch_num == (3, 1)
+    assert grid.origins == ((0, 64, 128), (0,))
+    assert grid.num_patches == 3 * 3 * 1
+    assert grid.stitched_shape == (3, 256, 128)
+
+
+def test_patch_array_views():
+    source = np.random.rand(2, 200, 150).astype(np.float32)
+    grid = get_patch_grid(source.shape, patch_size=64, overlap=(0.5, 0.5))
+    patches = PatchArray(source, grid)
+
+    nx, ny = grid.patch_num
+    assert patches.shape == (2 * nx * ny, 64, 64)
+
+    # single patches are read-only views of the source
+    patch = patches[nx * ny + ny + 2]
+    assert np.shares_memory(patch, source) and not patch.flags.writeable
+    np.testing.assert_array_equal(patch, source[1, 32:96, 64:128])
+
+    expected = np.stack([
+        source[iz, x_s:x_s + 64, y_s:y_s + 64]
+        for iz in range(2) for x_s in grid.origins[0] for y_s in grid.origins[1]
+    ])
+    np.testing.assert_array_equal(np.asarray(patches), expected)
+    np.testing.assert_array_equal(patches[3:9], expected[3:9])
+
+
+@pytest.mark.parametrize("use_cosine", [True, False])
+def test_stitch_matches_debcr(use_cosine):
+    debcr = pytest.importorskip("debcr")
+
+    source = np.random.rand(3, 224, 224).astype(np.float32)
+    patches = debcr.data.crop(source, patch_size=64, overlap=(0.5, 0.5))
+    _, patch_num = debcr.data.crop(source, patch_size=64, overlap=(0.5, 0.5), dry_run=True)
+    expected = debcr.data.stitch(patches, patch_num=patch_num, overlap=(0.5, 0.5), use_cosine=use_cosine)
+
+    grid = get_stitch_grid(patches.shape, patch_num, (0.5, 0.5))
+    output = stitch(patches, grid, use_cosine=use_cosine, workers=2)
+    assert output.shape == expected.shape and output.dtype == np.float32
+    np.testing.assert_allclose(output, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_stitch_patch_views_roundtrip():
+    source = np.random.rand(2, 160, 224).astype(np.float32)
+    grid = get_patch_grid(source.shape, patch_size=64, overlap=(0.5, 0.5))
+
+    # without cosine blending, stitching undoes cropping in the covered area
+    output = stitch(PatchArray(source, grid), grid, use_cosine=False)
+    _, sz_x, sz_y = grid.stitched_shape
+    np.testing.assert_allclose(output, source[:, :sz_x, :sz_y], rtol=1e-5)
+
+
+def test_cover_grid():
+    grid = get_cover_grid((2, 200, 128), patch_size=64, overlap=(0.5, 0.25))
+
+    assert grid.origins == ((0, 32, 64, 96, 128, 136), (0, 48, 64))
+    assert grid.stitched_shape == (2, 200, 128)
+
+
+@pytest.mark.parametrize("mode", [{}, {'use_views': True}, {'use_scratch': True}])
+def test_crop_stitch_roundtrip_nonsquare_grid(mode, tmp_path):
+    pytest.importorskip("debcr")
+    from napari_debcr._transforms import run_transform
+
+    source = np.random.rand(2, 64, 128).astype(np.float32)
+    params = {'patch_size': 32, 'overlap': (0.5, 0.5), 'use_cosine': False, 'scratch_dir': str(tmp_path), **mode}
+
+    patches, metadata = run_transform('crop', source, params)
+    grid = metadata['patch_grid']
+    assert grid.patch_num == (3, 7)
+
+    # every crop mode has the layout described by the metadata
+    np.testing.assert_array_equal(np.asarray(patches), np.asarray(PatchArray(source, grid)))
+
+    output, _ = run_transform('stitch', patches, dict(params, patch_num=grid.patch_num))
+    _, sz_x, sz_y = grid.stitched_shape
+    np.testing.assert_allclose(output, source[:, :sz_x, :sz_y], rtol=1e-5)
@@ -0,0 +1,210 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+
+def test_prefetch():
+    pytest.importorskip("debcr")
+    from napari_debcr._predict import prefetch
+
+    assert list(prefetch(iter(range(10)), depth=2)) == list(range(10))
+    assert list(prefetch(iter(range(3)), depth=0)) == [0, 1, 2]
+
+    # producer errors are raised in the consumer
+    def failing():
+        yield 1
+        raise ValueError('bad block')
+    with pytest.raises(ValueError, match='bad block'):
+        list(prefetch(failing(), depth=2))
+
+    # a consumer stopping early releases the producer
+    threads = threading.active_count()
+    items = prefetch(iter(range(100)), depth=1)
+    assert next(items) == 0
+    items.close()
+    assert threading.active_count() == threads
+
+
+@pytest.mark.parametrize("prefetch_depth", [0, 2])
+def test_predict_blocks(prefetch_depth, scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._predict import predict_blocks
+
+    data = np.random.rand(21, 16, 16).astype(np.float32)
+    progress = []
+    output = predict_blocks(scale_model(16), data, batch_size=2, prefetch_depth=prefetch_depth,
+                            callback=lambda done, total: progress.append(done))
+
+    np.testing.assert_allclose(output, 2 * data)
+    assert progress == [16, 21]
+
+
+@pytest.mark.parametrize("dtype", ["float16", "uint16"])
+def test_predict_output_dtype(dtype, scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._predict import predict_blocks
+    from napari_debcr._restore import restore
+
+    data = np.random.rand(4, 16, 16).astype(np.float32) / 2
+    model = scale_model(16)
+    tol = 1e-3 if dtype == "float16" else 1 / 65535
+
+    output = predict_blocks(model, data, batch_size=2, dtype=dtype)
+    assert output.dtype == dtype
+    scale = 65535 if dtype == "uint16" else 1 # uint16: rescaled from [0, 1]
+    np.testing.assert_allclose(output / scale, 2 * data, atol=tol)
+
+    large = np.random.rand(2, 40, 40).astype(np.float32) / 2
+    output = restore(model, large, batch_size=2, pmin=None, pmax=None, cover=True, dtype=dtype)
+    assert output.dtype == dtype and output.shape == large.shape
+    np.testing.assert_allclose(output / scale, 2 * large, atol=tol)
+
+
+def test_predict_cancelled(scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._predict import PredictionCancelled, predict_blocks
+
+    data = np.random.rand(40, 16, 16).astype(np.float32)
+    out = np.zeros_like(data)
+
+    def cancel_after_first(done, total):
+        raise PredictionCancelled()
+
+    # blocks done before cancelling are kept
+    with pytest.raises(PredictionCancelled):
+        predict_blocks(scale_model(16), data, batch_size=2, out=out, callback=cancel_after_first)
+    np.testing.assert_allclose(out[:16], 2 * data[:16])
+    assert not np.any(out[16:])
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_lazy_prediction():
+    pytest.importorskip("debcr")
+    from napari_debcr._lazy_predict import LazyPredictionArray
+
+    data = np.random.rand(20, 8, 8).astype(np.float32)
+    calls, ready = [], []
+    def predict_func(start, stop):
+        calls.append((start, stop))
+        return 2 * data[start:stop]
+
+    lazy = LazyPredictionArray(predict_func, data.shape, max_nbytes=6 * data[0].nbytes, prefetch_radius=2,
+                               on_ready=lambda: ready.append(True))
+
+    # reads do not wait for the model: missing slices are zeros until predicted
+    assert not np.any(lazy[10])
+    assert _wait_for(lambda: lazy.cached_slices == [8, 9, 10, 11, 12])
+    assert calls[0] == (10, 11) and len(calls) == 5
+    assert ready == [True] # only the read slice is on display
+    np.testing.assert_allclose(lazy[8:13], 2 * data[8:13])
+    assert len(calls) == 5
+
+    # slices of the read range are kept, least recently used others dropped
+    lazy.prefetch_radius = 0
+    lazy[0:2]
+    assert _wait_for(lambda: 0 in lazy.cached_slices and 1 in lazy.cached_slices)
+    assert len(lazy.cached_slices) == 6 and 8 not in lazy.cached_slices
+
+
+def test_lazy_prediction_bounded_by_cache():
+    pytest.importorskip("debcr")
+    from napari_debcr._lazy_predict import LazyPredictionArray
+
+    data = np.random.rand(20, 8, 8).astype(np.float32)
+    calls = []
+    def predict_func(start, stop):
+        calls.append(start)
+        return data[start:stop]
+
+    # reading all slices (e.g. 3D view) queues only as many as fit, once
+    lazy = LazyPredictionArray(predict_func, data.shape, max_nbytes=4 * data[0].nbytes)
+    np.asarray(lazy)
+    assert _wait_for(lambda: len(lazy.cached_slices) == 4)
+    np.asarray(lazy)
+    time.sleep(0.05)
+    assert calls == [0, 1, 2, 3]
+
+    errors = []
+    def failing(start, stop):
+        raise ValueError('bad slice')
+    lazy = LazyPredictionArray(failing, data.shape, prefetch_radius=0, on_error=errors.append)
+    lazy[3]
+    assert _wait_for(lambda: len(errors) == 1) and lazy.cached_slices == []
+
+
+def test_lazy_prediction_is_not_saved(tmp_path):
+    pytest.importorskip("debcr")
+    from napari_debcr._batch import _to_shared
+    from napari_debcr._lazy_predict import LazyPredictionArray
+    from napari_debcr._writer import npz_file_writer
+
+    lazy = LazyPredictionArray(lambda start, stop: np.ones((stop - start, 8, 8)), (4, 8, 8), prefetch_radius=0)
+
+    # displayed slices only: never written or processed as data
+    with pytest.raises(ValueError, match="on demand"):
+        npz_file_writer(str(tmp_path / "out.npz"), [(lazy, {"name": "x.pred"}, "image")])
+    with pytest.raises(ValueError, match="on demand"):
+        _to_shared(lazy)
+
+
+def test_slice_predictor(scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._lazy_predict import make_slice_predictor
+    from napari_debcr._restore import restore
+
+    data = 1000 * np.random.rand(6, 64, 64).astype(np.float32)
+    model = scale_model(32)
+
+    # slices are normalized by the percentiles of the whole stack
+    predict_func, shape = make_slice_predictor(model, data, 'restore', batch_size=4)
+    expected = restore(model, data, batch_size=4)
+    assert shape == expected.shape
+    np.testing.assert_allclose(predict_func(2, 4), expected[2:4], atol=1e-5)
+
+    predict_func, shape = make_slice_predictor(model, data[:, :40, :40], 'predict', batch_size=4)
+    assert shape == (6, 40, 40)
+    np.testing.assert_allclose(predict_func(0, 1), 2 * data[:1, :40, :40], rtol=1e-5)
+
+
+def test_warm_up(scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._predict import warm_up
+
+    calls = []
+    class CountingModel(scale_model):
+        def predict(self, inputs, batch_size=32, **kwargs):
+            calls.append(np.shape(inputs[0])[:3])
+            return super().predict(inputs, batch_size)
+
+    model = CountingModel(16)
+    assert warm_up(model, batch_size=4)
+    assert calls == [(4, 16, 16)]
+
+    # once per batch size
+    assert not warm_up(model, batch_size=4)
+    assert warm_up(model, batch_size=8) and len(calls) == 2
+
+
+def test_reduced_model_keeps_global_policy(monkeypatch):
+    tf = pytest.importorskip("tensorflow")
+    from napari_debcr._precision import get_policy_name, get_reduced_model
+
+    monkeypatch.setattr('napari_debcr._precision.get_reduced_policy', lambda: 'mixed_float16')
+    inputs = tf.keras.Input((16, 16, 1))
+    model = tf.keras.Model(inputs, tf.keras.layers.Conv2D(1, 3, padding='same')(inputs))
+
+    reduced = get_reduced_model(model)
+
+    # built with per-layer policies, not by switching the global one
+    assert tf.keras.mixed_precision.global_policy().name == 'float32'
+    assert get_policy_name(reduced) == 'mixed_float16' and get_policy_name(model) == 'float32'
+    for weights, reduced_weights in zip(model.get_weights(), reduced.get_weights()):
+        np.testing.assert_array_equal(weights, reduced_weights)
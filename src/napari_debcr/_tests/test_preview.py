@@ -0,0 +1,33 @@
+import numpy as np
+
+from napari_debcr._patches import PatchArray, get_patch_grid
+from napari_debcr._preview import get_slice_index, preview_crop, preview_normalize
+
+
+def test_get_slice_index():
+    assert get_slice_index((3, 0, 0), (5, 64, 64)) == 3
+    assert get_slice_index((1, 7, 0, 0), (5, 64, 64)) == 4 # layer with fewer dims
+    assert get_slice_index((0, 0), (5, 64, 64)) == 0
+
+
+def test_preview_normalize():
+    data = np.random.randint(0, 1000, size=(4, 32, 32)).astype(np.uint16)
+
+    expected = np.clip((data - np.percentile(data, 1)) / (np.percentile(data, 99) - np.percentile(data, 1)), 0, 1)
+    preview = preview_normalize(data, 2, pmin=1, pmax=99)
+    assert preview.shape == (32, 32) and preview.dtype == np.float32
+    np.testing.assert_allclose(preview, expected[2], rtol=1e-5, atol=1e-6)
+
+
+def test_preview_crop():
+    data = np.random.rand(2, 100, 80).astype(np.float32)
+    boxes = preview_crop(data.shape, patch_size=32, overlap=(0.5, 0.5))
+
+    grid = get_patch_grid(data.shape, 32, (0.5, 0.5))
+    patches = PatchArray(data, grid)
+    assert len(boxes) == len(patches) // 2
+
+    # each box outlines the matching patch of a slice
+    for box, patch in zip(boxes, patches[:len(boxes)]):
+        (x0, y0), (x1, y1) = box.min(axis=0).astype(int), box.max(axis=0).astype(int)
+        np.testing.assert_array_equal(data[0, x0:x1, y0:y1], patch)
@@ -1,6 +1,9 @@
 import numpy as np
+import pytest
 
-from napari_debcr import napari_get_reader
+from napari_debcr import get_reader
+from napari_debcr._npz import DeflateStream, NpzMemberArray, read_npz_index
+from napari_debcr._tiff import TiffPagesArray
 
 
 # tmp_path is a pytest fixture
@@ -8,12 +11,12 @@ def test_reader(tmp_path):
     """An example of how you might test your plugin."""
 
     # write some fake data using your supported file format
-    my_test_file = str(tmp_path / "myfile.npy")
+    my_test_file = str(tmp_path / "myfile.npz")
     original_data = np.random.rand(20, 20)
-    np.save(my_test_file, original_data)
+    np.savez(my_test_file, data=original_data)
 
     # try to read it back in
-    reader = napari_get_reader(my_test_file)
+    reader = get_reader(my_test_file)
     assert callable(reader)
 
     # make sure we're delivering the right format
@@ -21,11 +24,142 @@ def test_reader(tmp_path):
     assert isinstance(layer_data_list, list) and len(layer_data_list) > 0
     layer_data_tuple = layer_data_list[0]
     assert isinstance(layer_data_tuple, tuple) and len(layer_data_tuple) > 0
+    assert layer_data_tuple[1]["name"] == "myfile.data"
 
     # make sure it's the same as it started
     np.testing.assert_allclose(original_data, layer_data_tuple[0])
 
 
+def test_reader_lazy_members(tmp_path):
+    my_test_file = str(tmp_path / "myfile.npz")
+    low = np.random.rand(6, 16, 16).astype(np.float32)
+    gt = np.arange(6 * 16 * 16, dtype=np.uint16).reshape(6, 16, 16)
+    np.savez(my_test_file, low=low, gt=gt)
+
+    layers = {meta["name"]: data for data, meta, _ in get_reader(my_test_file)(my_test_file)}
+
+    # uncompressed members are memory-mapped
+    assert isinstance(layers["myfile.low"], np.memmap)
+    np.testing.assert_array_equal(layers["myfile.low"][2], low[2])
+    np.testing.assert_array_equal(layers["myfile.gt"], gt)
+
+
+def test_reader_compressed_members(tmp_path):
+    my_test_file = str(tmp_path / "myfile.npz")
+    original_data = np.random.rand(8, 12, 10)
+    np.savez_compressed(my_test_file, data=original_data)
+
+    data, _, _ = get_reader(my_test_file)(my_test_file)[0]
+
+    # compressed members are decompressed on demand
+    assert isinstance(data, NpzMemberArray)
+    assert data.shape == original_data.shape and data.dtype == original_data.dtype
+    np.testing.assert_array_equal(data[5], original_data[5])
+    np.testing.assert_array_equal(data[1], original_data[1])
+    np.testing.assert_array_equal(data[-3:, 2, ::2], original_data[-3:, 2, ::2])
+    np.testing.assert_array_equal(data[[0, 7]], original_data[[0, 7]])
+    np.testing.assert_array_equal(np.asarray(data), original_data)
+
+
+def test_deflate_stream_random_access(tmp_path):
+    import zlib
+
+    data = np.random.randint(0, 50, size=2 * 1024**2, dtype=np.uint8).tobytes()
+    comp = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    path = tmp_path / "stream.bin"
+    path.write_bytes(b"head" + comp.compress(data) + comp.flush())
+
+    with open(path, "rb") as fh:
+        stream = DeflateStream(fh, 4, path.stat().st_size - 4, checkpoint_nbytes=128 * 1024)
+
+        # states are saved on the first pass, later reads in any order resume from them
+        assert stream.read(len(data) - 10, len(data) + 10) == data[-10:]
+        assert stream.num_checkpoints > 10
+        for start in [1024**2, 5, 1024**2 + 100, 300000, 0]:
+            assert stream.read(start, start + 70000) == data[start:start + 70000]
+
+
+def test_npz_index(tmp_path):
+    my_test_file = str(tmp_path / "myfile.npz")
+    low = np.zeros((4, 32, 32), dtype=np.uint16)
+    gt = np.zeros((4, 32, 32), dtype=np.float32)
+    np.savez_compressed(my_test_file, low=low, gt=gt)
+
+    index = read_npz_index(my_test_file)
+    assert set(index) == {"low", "gt"}
+    assert index["low"].shape == low.shape and index["low"].dtype == low.dtype
+    assert index["gt"].nbytes == gt.nbytes
+    assert index["gt"].compressed and index["gt"].file_nbytes < gt.nbytes
+
+
+def test_get_reader_invalid_npz(tmp_path):
+    my_test_file = str(tmp_path / "broken.npz")
+    with open(my_test_file, "wb") as f:
+        f.write(b"not a zip archive")
+
+    assert get_reader(my_test_file) is None
+
+
+def test_tiff_reader(tmp_path):
+    tifffile = pytest.importorskip("tifffile")
+
+    original_data = np.random.randint(0, 2**16, (5, 64, 48), dtype=np.uint16)
+    plain_file = str(tmp_path / "plain.tif")
+    packed_file = str(tmp_path / "packed.tif")
+    tifffile.imwrite(plain_file, original_data)
+    tifffile.imwrite(packed_file, original_data, compression="zlib")
+
+    for my_test_file in (plain_file, packed_file):
+        data, meta, _ = get_reader(my_test_file)(my_test_file)[0]
+        assert not meta["multiscale"]
+        assert isinstance(data, np.memmap if my_test_file == plain_file else TiffPagesArray)
+        assert data.shape == original_data.shape
+        np.testing.assert_array_equal(data[3], original_data[3])
+        np.testing.assert_array_equal(np.asarray(data), original_data)
+
+
+def test_tiff_reader_pyramid(tmp_path):
+    tifffile = pytest.importorskip("tifffile")
+
+    my_test_file = str(tmp_path / "pyramid.ome.tif")
+    original_data = np.random.randint(0, 255, (3, 64, 64), dtype=np.uint8)
+    with tifffile.TiffWriter(my_test_file, ome=True) as tif:
+        tif.write(original_data, subifds=1, metadata={"axes": "ZYX"})
+        tif.write(original_data[:, ::2, ::2], subfiletype=1)
+
+    data, meta, _ = get_reader(my_test_file)(my_test_file)[0]
+    assert meta["name"] == "pyramid" and meta["multiscale"]
+    assert [level.shape for level in data] == [(3, 64, 64), (3, 32, 32)]
+    np.testing.assert_array_equal(data[1][2], original_data[2, ::2, ::2])
+
+
 def test_get_reader_pass():
-    reader = napari_get_reader("fake.file")
+    reader = get_reader("fake.file")
     assert reader is None
+
+
+def test_shards_dir_reader(tmp_path):
+    shard_dir = tmp_path / "timelapse"
+    shard_dir.mkdir()
+    shards = [np.random.rand(n, 8, 8).astype(np.float32) for n in (3, 1, 4)]
+    for idx, shard in enumerate(shards):
+        # natural order: t2 goes before t10
+        np.savez(str(shard_dir / f"t{[1, 2, 10][idx]}.npz"), low=shard, gt=shard + 1)
+
+    reader = get_reader(str(shard_dir))
+    assert callable(reader)
+
+    layers = {meta["name"]: data for data, meta, _ in reader(str(shard_dir))}
+    original_data = np.concatenate(shards)
+    assert layers["timelapse.low"].shape == original_data.shape
+    np.testing.assert_array_equal(layers["timelapse.low"][2:5], original_data[2:5])
+    np.testing.assert_array_equal(layers["timelapse.gt"][7], original_data[7] + 1)
+    np.testing.assert_array_equal(np.asarray(layers["timelapse.low"]), original_data)
+
+
+def test_shards_dir_reader_mismatch(tmp_path):
+    np.savez(str(tmp_path / "a.npz"), data=np.zeros((2, 8, 8)))
+    np.savez(str(tmp_path / "b.npz"), data=np.zeros((2, 8, 9)))
+
+    with pytest.raises(ValueError):
+        get_reader(str(tmp_path))(str(tmp_path))
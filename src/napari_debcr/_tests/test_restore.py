@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("max_patches", [None, 5])
+def test_restore_matches_steps(max_patches, scale_model):
+    debcr = pytest.importorskip("debcr")
+    from napari_debcr._restore import restore
+
+    model = scale_model(64)
+    data = np.random.randint(0, 4096, size=(4, 192, 192)).astype(np.uint16)
+
+    # step by step, as in the transform and prediction widgets
+    # (square slices: debcr orders patches consistently only for nx == ny)
+    norm = debcr.data.normalize(data, pmin=1, pmax=99)
+    patches = debcr.data.crop(norm, patch_size=64, overlap=(0.5, 0.5))
+    _, patch_num = debcr.data.crop(norm, patch_size=64, overlap=(0.5, 0.5), dry_run=True)
+    pred = debcr.model.predict(eval_model=model, input_data=patches, batch_size=8)
+    expected = debcr.data.stitch(pred, patch_num=patch_num, overlap=(0.5, 0.5), use_cosine=True)
+
+    output = restore(model, data, batch_size=8, pmin=1, pmax=99, max_patches=max_patches)
+    assert output.shape == expected.shape and output.dtype == np.float32
+    np.testing.assert_allclose(output, expected, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("use_cosine", [True, False])
+@pytest.mark.parametrize("shape", [(3, 100, 150), (2, 40, 64)])
+def test_restore_cover_any_size(shape, use_cosine, scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._restore import restore
+
+    data = np.random.rand(*shape).astype(np.float32)
+
+    # tiles cover the whole image, including borders and images smaller than a tile
+    output = restore(scale_model(64), data, batch_size=4, use_cosine=use_cosine, pmin=None, pmax=None, cover=True)
+    assert output.shape == data.shape
+    np.testing.assert_allclose(output, 2 * data, rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize("overlap", [(0, 0), (0, 0.5), (0.01, 0.01)])
+def test_restore_cover_without_overlap(overlap, scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._restore import restore
+
+    data = np.random.rand(2, 256, 256).astype(np.float32)
+
+    # abutting tiles: no seams, even with cosine blending selected
+    output = restore(scale_model(64), data, batch_size=4, overlap=overlap, use_cosine=True, pmin=None, pmax=None, cover=True)
+    np.testing.assert_allclose(output, 2 * data, rtol=1e-4, atol=1e-5)
+
+
+def test_restore_progress(scale_model):
+    pytest.importorskip("debcr")
+    from napari_debcr._restore import get_restore_shape, restore
+
+    model = scale_model(64)
+    data = np.random.rand(5, 128, 128).astype(np.float32)
+    out = np.zeros(get_restore_shape(model, data.shape), dtype=np.float32)
+
+    # output is filled group by group, in place
+    progress = []
+    def on_progress(done, total):
+        progress.append((done, total))
+        assert np.any(out[done - 1]) and not np.any(out[done:])
+
+    restore(model, data, batch_size=4, pmin=None, pmax=None, out=out, max_patches=18, callback=on_progress)
+    assert progress == [(2, 5), (4, 5), (5, 5)]
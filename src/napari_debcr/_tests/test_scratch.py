@@ -0,0 +1,37 @@
+import gc
+import os
+
+import numpy as np
+import pytest
+
+from napari_debcr._scratch import scratch_empty
+
+
+def test_scratch_empty_removed_on_release(tmp_path):
+    array = scratch_empty((3, 16, 16), np.float32, str(tmp_path))
+    assert isinstance(array, np.memmap) and array.shape == (3, 16, 16)
+
+    array[:] = 1
+    view = array[1:]
+    del array
+    gc.collect()
+    assert len(os.listdir(tmp_path)) == 1 # still mapped by the view
+
+    del view
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("action", ["normalize", "crop", "stitch"])
+def test_transform_to_scratch(tmp_path, action):
+    from napari_debcr._transforms import run_transform
+
+    params = {'pmin': 1, 'pmax': 99, 'patch_size': 32, 'overlap': (0.5, 0.5), 'patch_num': (3, 3), 'use_cosine': True}
+    shape = (9, 32, 32) if action == 'stitch' else (2, 64, 64)
+    data = np.random.rand(*shape).astype(np.float32)
+
+    expected, _ = run_transform(action, data, dict(params, use_streaming=True, use_views=True))
+    output, _ = run_transform(action, data, dict(params, use_scratch=True, scratch_dir=str(tmp_path)))
+
+    assert isinstance(output, np.memmap) and len(os.listdir(tmp_path)) == 1
+    np.testing.assert_allclose(output, np.asarray(expected), rtol=1e-6)
@@ -0,0 +1,84 @@
+import json
+import time
+import types
+
+import numpy as np
+import pytest
+
+
+class ResourceExhaustedError(Exception):
+    pass
+
+
+class SizedModel:
+    """Stand-in for a DeBCR model with a fixed overhead per call, which
+    runs out of memory above `max_batch` images."""
+
+    name = 'sized'
+
+    def __init__(self, input_size=32, max_batch=16):
+        self.inputs = [types.SimpleNamespace(shape=(None, input_size, input_size, 1))]
+        self.max_batch = max_batch
+        self.calls = 0
+
+    def count_params(self):
+        return 1
+
+    def predict(self, inputs, batch_size=32, **kwargs):
+        self.calls += 1
+        if len(inputs[0]) > self.max_batch:
+            raise ResourceExhaustedError('OOM')
+        time.sleep(0.002)
+        return [np.asarray(inputs[0], dtype=np.float32)]
+
+
+def test_tune_batch_size(tmp_path, monkeypatch):
+    pytest.importorskip("debcr")
+    from napari_debcr._tuning import tune_batch_size
+
+    monkeypatch.setattr('napari_debcr._tuning._tuned', {})
+    cache_path = str(tmp_path / 'batch_sizes.json')
+
+    # throughput grows with the batch size until the model runs out of memory
+    model = SizedModel(max_batch=16)
+    assert tune_batch_size(model, cache_path=cache_path) == 16
+    assert list(json.load(open(cache_path)).values()) == [16]
+
+    # measured only once per model and host
+    monkeypatch.setattr('napari_debcr._tuning._tuned', {})
+    calls = model.calls
+    assert tune_batch_size(model, cache_path=cache_path) == 16
+    assert model.calls == calls
+
+
+def test_tuning_key():
+    pytest.importorskip("debcr")
+    from napari_debcr._tuning import get_tuning_key
+
+    model = SizedModel()
+    reduced = SizedModel()
+    reduced.dtype_policy = types.SimpleNamespace(name='mixed_float16')
+
+    # re-tuned for another memory budget or precision
+    key = get_tuning_key(model, 32, 1024**3)
+    assert key != get_tuning_key(model, 32, 2 * 1024**3)
+    assert key != get_tuning_key(reduced, 32, 1024**3)
+    assert key == get_tuning_key(SizedModel(), 32, 1024**3)
+
+
+def test_cpu_memory_probe(monkeypatch):
+    pytest.importorskip("debcr")
+    from napari_debcr import _tuning
+
+    if _tuning._current_rss() is None:
+        pytest.skip("no /proc/self/statm")
+    monkeypatch.setattr(_tuning, '_gpu_device', lambda: None)
+
+    # growth is measured from the current RSS, also after a higher earlier peak
+    peak = np.ones(256 * 1024**2 // 8)
+    del peak
+    _tuning._reset_peak_memory()
+    data = np.ones(64 * 1024**2 // 8)
+    nbytes = _tuning._peak_memory()
+    del data
+    assert nbytes >= 32 * 1024**2
@@ -1,7 +1,51 @@
-# from napari_debcr import write_single_image, write_multiple
+import numpy as np
+import pytest
 
-# add your tests here...
+from napari_debcr import get_reader, npz_file_writer, zarr_file_writer
 
 
-def test_something():
-    pass
+def test_zarr_writer_roundtrip(tmp_path):
+    pytest.importorskip("zarr")
+
+    my_test_file = str(tmp_path / "myfile.zarr")
+    low = np.random.rand(3, 40, 30).astype(np.float32)
+    gt = np.random.randint(0, 2**16, (3, 40, 30), dtype=np.uint16)
+    layers_data = [
+        (low, {"name": "low"}, "image"),
+        (gt, {"name": "gt"}, "image"),
+    ]
+
+    assert zarr_file_writer(my_test_file, layers_data) == [my_test_file]
+
+    reader = get_reader(my_test_file)
+    assert callable(reader)
+
+    layers = {meta["name"]: data for data, meta, _ in reader(my_test_file)}
+    assert set(layers) == {"myfile.low", "myfile.gt"}
+    np.testing.assert_array_equal(layers["myfile.low"][:], low)
+    np.testing.assert_array_equal(layers["myfile.gt"][1], gt[1])
+
+
+@pytest.mark.parametrize("compression_level", [None, 6])
+def test_npz_writer_multiple_layers(tmp_path, compression_level):
+    my_test_file = str(tmp_path / "myfile.npz")
+    low = np.random.rand(5, 16, 24).astype(np.float32)
+    gt = np.random.randint(0, 2**16, (5, 16, 24), dtype=np.uint16)
+    layers_data = [
+        (low, {"name": "low"}, "image"),
+        (gt, {"name": "gt"}, "image"),
+        (gt, {"name": "gt"}, "image"),
+    ]
+
+    assert npz_file_writer(my_test_file, layers_data, compression_level=compression_level) == [my_test_file]
+
+    # archive stays readable by numpy itself
+    with np.load(my_test_file) as data:
+        assert sorted(data.files) == ["gt", "gt_1", "low"]
+        np.testing.assert_array_equal(data["low"], low)
+        np.testing.assert_array_equal(data["gt_1"], gt)
+
+    layers = {meta["name"]: data for data, meta, _ in get_reader(my_test_file)(my_test_file)}
+    assert isinstance(layers["myfile.low"], np.memmap) == (compression_level is None)
+    np.testing.assert_array_equal(layers["myfile.low"][3], low[3])
+    np.testing.assert_array_equal(layers["myfile.gt"][:, 2], gt[:, 2])
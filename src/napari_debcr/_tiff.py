@@ -0,0 +1,78 @@
+import threading
+import numpy as np
+
+from typing import List
+
+from ._lazy import LazyArray
+
+class TiffPagesArray(LazyArray):
+    """Lazy view of a TIFF page series, which decodes pages on demand.
+
+    Used for compressed or tiled files, which can not be memory-mapped.
+    """
+
+    def __init__(self, tif, series):
+        super().__init__(series.shape, series.dtype)
+        self.tif = tif
+        self.pages = series.pages
+        self.page_shape = self.pages[0].shape
+        # pages per row along the first axis
+        self.row_npages = len(self.pages) // self.shape[0]
+        self._lock = threading.Lock()
+
+    def _read_rows(self, start, stop):
+
+        rows = np.empty((stop - start,) + self.shape[1:], dtype=self.dtype)
+        flat = rows.reshape((-1,) + self.page_shape)
+        with self._lock:
+            for i, page_idx in enumerate(range(start * self.row_npages, stop * self.row_npages)):
+                flat[i] = self.pages[page_idx].asarray()
+
+        return rows
+
+def open_tiff(path: str) -> List[object]:
+    """Open the first image series of a (OME-)TIFF file without reading data.
+
+    Returns all pyramid levels, full resolution first. Levels are
+    memory-mapped if stored contiguously and uncompressed, otherwise read
+    lazily page by page.
+    """
+
+    tifffile = _import_tifffile()
+
+    tif = tifffile.TiffFile(path)
+    series = tif.series[0]
+
+    levels = []
+    for level, level_series in enumerate(series.levels):
+        try:
+            levels.append(tifffile.memmap(path, series=0, level=level, mode='r'))
+        except ValueError:
+            levels.append(_open_pages(tif, level_series))
+
+    # page-wise views keep reading from the open file
+    if not any(isinstance(data, TiffPagesArray) for data in levels):
+        tif.close()
+
+    return levels
+
+def _open_pages(tif, series):
+
+    # page-wise access fits series, which stack equally shaped pages
+    shape = series.shape
+    pages = series.pages
+    page_ndim = len(pages[0].shape)
+    if len(shape) > page_ndim and pages[0].shape == shape[-page_ndim:] \
+            and len(pages) == int(np.prod(shape[:-page_ndim])):
+        return TiffPagesArray(tif, series)
+
+    return series.asarray()
+
+def _import_tifffile():
+    try:
+        import tifffile
+    except ImportError as e:
+        raise ImportError(
+            'TIFF support requires the "tifffile" package: pip install "napari-debcr[tiff]"'
+        ) from e
+    return tifffile
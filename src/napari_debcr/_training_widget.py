@@ -1,3 +1,5 @@
+import numpy as np
+
 from qtpy.QtWidgets import (
     QApplication,
     QGroupBox,
@@ -16,14 +18,17 @@ if TYPE_CHECKING:
 
 from ._input_data_widget import InputDataGroupBox
 from ._load_weights_widget import LoadWeightsGroupBox
+from ._model_cache import MODEL_CACHE, clone_model
 from ._model_configs_widget import ModelConfigsGroupBox
+from ._lazy import check_complete
+from ._shapes import check_training_shapes
 
 import debcr
 
 class TrainingThread(QThread):
     finished_signal = Signal()  # Signal to notify when finished
     log_signal = Signal(str) # Signal for log messages
-    result_signal = Signal(object)  # Signal to pass prediction results (image data, name)
+    result_signal = Signal(object, object)  # Signal to pass training results (trained model, copy to share)
     
     def __init__(self, widget, config, model):
         super().__init__()
@@ -37,7 +42,7 @@ class TrainingThread(QThread):
         
         for layer in self.widget.viewer.layers:
             if isinstance(layer, napari.layers.Image) and (layer.name == input_name) and (layer.data is not None):
-                input_data = layer.data
+                input_data = layer.data[0] if layer.multiscale else layer.data
                 break
         
         return input_data
@@ -57,6 +62,12 @@ class TrainingThread(QThread):
                 
                 if input_data is None:
                     self.abort_training(message = f'Image stack not found: \'{input_name}\'')
+                    return
+                
+                error = check_complete(input_data, input_name)
+                if error is not None:
+                    self.abort_training(error)
+                    return
                 
                 data[dataset][subset] = input_data
 
@@ -66,24 +77,29 @@ class TrainingThread(QThread):
             "low": "input",
             "gt": "target"
         }
-        expected_shape = data["train"]["low"].shape[-2:]
-        equal_subset_shapes = True
-        for dataset in ["train", "val"]:
-            for subset in ["low", "gt"]:
-                input_data = data[dataset][subset]
-                input_shape = input_data.shape[-2:]
-                input_label = labels[dataset] + " " + labels[subset]
-                
-                if input_shape[0] != input_shape[1]:
-                    self.abort_training(f'\'{input_label}\' images are not non-square: {input_shape}')
-                elif input_shape != expected_shape:
-                    self.abort_training(f'\'{input_label}\' shape {input_shape} and training input shape {expected_shape} are different!')
+        
+        # validate shapes before any pixel data of lazy layers is read
+        shapes = {
+            f'{labels[dataset]} {labels[subset]}': data[dataset][subset].shape
+            for dataset in ["train", "val"] for subset in ["low", "gt"]
+        }
+        pairs = [(f'{labels[dataset]} input', f'{labels[dataset]} target') for dataset in ["train", "val"]]
+        error = check_training_shapes(shapes, pairs)
+        if error is not None:
+            self.abort_training(error)
+            return
         
         self.log_signal.emit('Starting model training...')
         
+        # read lazy layers only after the shape checks
+        for dataset in ["train", "val"]:
+            for subset in ["low", "gt"]:
+                data[dataset][subset] = np.asarray(data[dataset][subset])
+        
         model_trained = debcr.model.train(data["train"], data["val"], self.config, self.model)
         
-        self.result_signal.emit(model_trained)
+        # shared as a copy, built here off the GUI thread: training on in this tab leaves it unchanged
+        self.result_signal.emit(model_trained, clone_model(model_trained))
         self.log_signal.emit('Training is finished!')
         
         self.finished_signal.emit()  # Notify UI when done
@@ -123,7 +139,7 @@ class TrainingWidget(QWidget):
         layout.addWidget(self.data_widgets["val.gt"])
         
         # Widget: trained model
-        weigths_widget = LoadWeightsGroupBox(self.viewer, "Model to train", self.log_widget, add_init_ckbox=True)
+        weigths_widget = LoadWeightsGroupBox(self.viewer, "Model to train", self.log_widget, add_init_ckbox=True, private_model=True)
         layout.addWidget(weigths_widget)
         
         # Widget: training parameters
@@ -162,8 +178,9 @@ class TrainingWidget(QWidget):
         self.thread.finished_signal.connect(lambda: self._toggle_run_btn(True))
         self.thread.start()
 
-    def _update_model_object(self, trained_model):
+    def _update_model_object(self, trained_model, shared_model):
         self.debcr = trained_model
+        MODEL_CACHE.set_trained(self.train_config['weights_path'], shared_model)
     
     def _toggle_run_btn(self, enabled):
         if enabled:
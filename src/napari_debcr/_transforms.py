@@ -0,0 +1,58 @@
+import numpy as np
+
+from typing import Tuple
+
+from ._lazy import iter_row_blocks
+from ._normalize import normalize_streaming
+from ._patches import PatchArray, get_patch_grid, get_stitch_grid, stitch
+from ._scratch import scratch_empty
+
+# transform parameters used by each action
+TRANSFORM_ARGS = {
+    'normalize': ['pmin', 'pmax'],
+    'crop': ['overlap', 'patch_size'],
+    'stitch': ['overlap', 'patch_num', 'use_cosine'],
+}
+
+def run_transform(action: str, data, params: dict) -> Tuple[object, dict]:
+    """Run a data transform and return its output with metadata for the output layer.
+
+    `params` holds the transform settings; extra keys are ignored.
+    With `use_scratch`, the output is a disk-backed memmap in `scratch_dir`,
+    which is filled block by block.
+    """
+
+    run_args = {arg: params[arg] for arg in TRANSFORM_ARGS[action]}
+    metadata = {}
+    use_scratch = params.get('use_scratch', False)
+
+    if action == 'normalize' and (params.get('use_streaming') or use_scratch):
+        # block-wise: neither input nor a float copy of it is held in memory
+        out = scratch_empty(data.shape, np.float32, params.get('scratch_dir')) if use_scratch else None
+        return normalize_streaming(data, **run_args, out=out), metadata
+
+    if action == 'crop':
+        # patch layout comes from the shape, so crop runs only once;
+        # all modes share the PatchArray patch order, which `stitch` expects
+        metadata['patch_grid'] = get_patch_grid(data.shape, **run_args)
+        patches = PatchArray(data, metadata['patch_grid'])
+        if params.get('use_views'):
+            return patches, metadata
+        out = scratch_empty(patches.shape, patches.dtype, params.get('scratch_dir')) if use_scratch \
+            else np.empty(patches.shape, dtype=patches.dtype)
+        for start, stop in iter_row_blocks(patches):
+            out[start:stop] = patches[start:stop]
+        return out, metadata
+
+    if action == 'stitch':
+        # patches are read slice by slice, so patch views stay lazy
+        grid = get_stitch_grid(data.shape, run_args['patch_num'], run_args['overlap'])
+        out = scratch_empty(grid.stitched_shape, np.float32, params.get('scratch_dir')) if use_scratch else None
+        return stitch(data, grid, use_cosine=run_args['use_cosine'], out=out), metadata
+
+    data = np.asarray(data) # read lazy inputs once
+
+    # imported on use: `debcr` loads TensorFlow, e.g. in batch workers
+    import debcr
+    run_action = getattr(debcr.data, action)
+    return run_action(data, **run_args), metadata
@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import socket
+import threading
+
+import numpy as np
+
+from typing import Callable, Dict, Optional, Sequence
+
+import debcr
+
+from ._precision import get_policy_name
+
+# batch sizes tried in calibration, in increasing order
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# file of measured batch sizes per model and host
+TUNING_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'napari-debcr', 'batch_sizes.json')
+
+_tuned = {} # batch sizes measured in this session
+
+def tune_batch_size(model, max_nbytes: Optional[int] = None, batch_sizes: Sequence[int] = BATCH_SIZES,
+                    cache_path: Optional[str] = TUNING_CACHE, log: Optional[Callable[[str], None]] = None) -> int:
+    """Pick the batch size with the highest prediction throughput.
+
+    Synthetic model-sized inputs are predicted at increasing batch sizes,
+    until the memory used exceeds `max_nbytes`, the model runs out of memory,
+    or the throughput drops. The result is cached per model, precision,
+    memory budget and host in `cache_path` (set to None to keep it for this
+    session only).
+    """
+
+    input_size = int(model.inputs[0].shape[1])
+    key = get_tuning_key(model, input_size, max_nbytes)
+
+    if key in _tuned:
+        return _tuned[key]
+    cached = _read_cache(cache_path)
+    if key in cached:
+        return int(cached[key])
+
+    best_size, best_rate = batch_sizes[0], 0.0
+    for batch_size in batch_sizes:
+        try:
+            rate, nbytes = _measure(model, input_size, batch_size)
+        except Exception as e:
+            if not _is_out_of_memory(e):
+                raise
+            break
+
+        if log is not None:
+            memory = f'{nbytes / 1024**2:.0f} MB' if nbytes is not None else 'n/a'
+            log(f'batch size {batch_size}: {rate:.1f} images/s, memory {memory}')
+        if max_nbytes and nbytes is not None and nbytes > max_nbytes:
+            break
+        if rate > best_rate:
+            best_size, best_rate = batch_size, rate
+        elif rate < 0.9 * best_rate:
+            break # past the saturation point
+
+    _tuned[key] = cached[key] = best_size
+    _write_cache(cache_path, cached)
+
+    return best_size
+
+def get_tuning_key(model, input_size: int, max_nbytes: Optional[int] = None) -> str:
+    try:
+        num_params = model.count_params()
+    except Exception:
+        num_params = None
+    policy = get_policy_name(model) # reduced-precision copies are tuned on their own
+    return (f'{socket.gethostname()}|{_device_name()}|{getattr(model, "name", type(model).__name__)}|{num_params}|'
+            f'{input_size}|{policy}|{max_nbytes or 0}')
+
+def _measure(model, input_size, batch_size, repeats=2):
+
+    data = np.random.rand(batch_size, input_size, input_size).astype(np.float32)
+    debcr.model.predict(eval_model=model, input_data=data, batch_size=batch_size) # warm-up, e.g. graph tracing
+
+    _reset_peak_memory()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        debcr.model.predict(eval_model=model, input_data=data, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    return repeats * batch_size / max(elapsed, 1e-9), _peak_memory()
+
+# memory probes: GPU memory of TensorFlow if available, else process RSS growth
+
+def _gpu_device():
+    tf = sys.modules.get('tensorflow')
+    if tf is None:
+        return None
+    gpus = tf.config.list_logical_devices('GPU')
+    return gpus[0].name if gpus else None
+
+def _device_name():
+    return _gpu_device() or 'CPU'
+
+class _RssMonitor:
+    """Peak RSS growth over a baseline, sampled in a background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.baseline = self.peak = _current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss())
+
+    def stop(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+        return self.peak - self.baseline
+
+_rss_monitor = None
+
+def _reset_peak_memory():
+    global _rss_monitor
+    if _rss_monitor is not None:
+        _rss_monitor.stop() # left running by a failed measurement
+        _rss_monitor = None
+    device = _gpu_device()
+    if device is not None:
+        sys.modules['tensorflow'].config.experimental.reset_memory_stats(device)
+    elif _current_rss() is not None:
+        _rss_monitor = _RssMonitor()
+
+def _peak_memory() -> Optional[int]:
+    global _rss_monitor
+    device = _gpu_device()
+    if device is not None:
+        return int(sys.modules['tensorflow'].config.experimental.get_memory_info(device)['peak'])
+    if _rss_monitor is None:
+        return None
+    monitor, _rss_monitor = _rss_monitor, None
+    return monitor.stop()
+
+def _current_rss() -> Optional[int]:
+    # current, not lifetime peak RSS: a session past its peak still shows growth
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None # e.g. on macOS or Windows: budget not enforced on CPU
+
+def _is_out_of_memory(error):
+    return isinstance(error, MemoryError) or type(error).__name__ == 'ResourceExhaustedError'
+
+def _read_cache(cache_path) -> Dict[str, int]:
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_cache(cache_path, cached):
+    if not cache_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(cached, f, indent=1)
+    except OSError:
+        pass # still kept for this session
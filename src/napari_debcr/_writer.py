@@ -1,9 +1,10 @@
-import os
-import numpy as np
-
-from typing import Callable, List, Any, Literal, Tuple
+from typing import Callable, List, Any, Literal, Tuple, Optional
 from typing import TYPE_CHECKING
 
+from ._lazy import check_complete
+from ._npz import write_npz
+from ._zarr import write_zarr
+
 if TYPE_CHECKING:
     import napari
 
@@ -13,10 +14,43 @@ LayerName = Literal["image"]
 FullLayerData = Tuple[DataType, LayerAttributes, LayerName]
 NpzFileWriter = Callable[[str, FullLayerData], List[str]]
 
-def npz_file_writer(path: str, layers_data: FullLayerData) -> List[str]:
+def npz_file_writer(path: str, layers_data: List[FullLayerData], compression_level: Optional[int] = None) -> List[str]:
+
+    # one archive member per layer, streamed without a full in-memory copy
+    write_npz(path, _get_layer_arrays(layers_data), compression_level=compression_level)
+
+    return [path]
+
+
+def zarr_file_writer(path: str, layers_data: List[FullLayerData]) -> List[str]:
+
+    write_zarr(path, _get_layer_arrays(layers_data))
+
+    return [path]
+
+
+def _get_layer_arrays(layers_data: List[FullLayerData]) -> dict:
+
+    arrays = {}
+    for layer_data, layer_attrs, _ in layers_data:
+        if layer_attrs.get("multiscale"):
+            layer_data = layer_data[0] # full resolution level
+        name = _get_array_name(layer_attrs.get("name", "data"), arrays)
+        error = check_complete(layer_data, layer_attrs.get("name", name))
+        if error is not None:
+            raise ValueError(error)
+        arrays[name] = layer_data
+
+    return arrays
+
+
+def _get_array_name(layer_name: str, used_names) -> str:
+
+    # path separators are not allowed in array names
+    name = layer_name.replace("/", "_").replace("\\", "_") or "data"
+    unique_name, idx = name, 1
+    while unique_name in used_names:
+        unique_name = f"{name}_{idx}"
+        idx += 1
 
-    layer_data = layers_data[0]
-    image_data = np.asarray(layer_data[0])
-    np.savez(path, data=image_data)
-    
-    return [path]
\ No newline at end of file
+    return unique_name
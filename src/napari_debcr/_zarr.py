@@ -0,0 +1,54 @@
+import os
+import numpy as np
+
+from typing import Dict
+
+# chunk edge along the image (YX) axes; leading axes are chunked by one
+CHUNK_EDGE = 512
+
+def open_zarr(path: str) -> Dict[str, object]:
+    """Open a Zarr array or all arrays of a Zarr group without reading data."""
+
+    zarr = _import_zarr()
+
+    node = zarr.open(path, mode='r')
+    if hasattr(node, 'shape'):
+        return {'data': node}
+
+    return dict(sorted(node.arrays()))
+
+def write_zarr(path: str, arrays: Dict[str, object]):
+    """Write arrays into a chunked, compressed Zarr group, one block at a time."""
+
+    zarr = _import_zarr()
+
+    zarr.open_group(path, mode='w')
+    for name, data in arrays.items():
+        chunks = get_chunks(data.shape)
+        out = zarr.open_array(os.path.join(path, name), mode='w',
+                              shape=data.shape, chunks=chunks, dtype=data.dtype)
+        if data.ndim == 0:
+            out[...] = np.asarray(data)
+            continue
+
+        # copy by chunk rows: only one block of the source is in memory
+        step = chunks[0]
+        for start in range(0, data.shape[0], step):
+            out[start:start + step] = np.asarray(data[start:start + step])
+
+def get_chunks(shape):
+    if len(shape) == 0:
+        return ()
+    if len(shape) == 1:
+        return (max(1, min(shape[0], CHUNK_EDGE**2)),)
+    lead = (1,) * (len(shape) - 2)
+    return lead + tuple(max(1, min(s, CHUNK_EDGE)) for s in shape[-2:])
+
+def _import_zarr():
+    try:
+        import zarr
+    except ImportError as e:
+        raise ImportError(
+            'Zarr support requires the "zarr" package: pip install "napari-debcr[zarr]"'
+        ) from e
+    return zarr